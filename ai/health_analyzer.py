@@ -6,12 +6,58 @@ AI-powered health analysis and recommendations
 import logging
 import numpy as np
 import pandas as pd
-from typing import Dict, List, Tuple
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple
 from sklearn.ensemble import IsolationForest
 from sklearn.preprocessing import StandardScaler
 
 logger = logging.getLogger(__name__)
 
+# Centered x-axis and its sum of squares for every trend window length in use,
+# so the least-squares slope needs no per-call allocation
+_X_ARR = {n: np.arange(n, dtype=np.float64) - (n - 1) / 2.0 for n in range(5, 25)}
+_X_SS = {n: float(x @ x) for n, x in _X_ARR.items()}
+
+def _trend_slope(values: pd.Series) -> float:
+    """Least-squares slope per reading (same as np.polyfit(x, y, 1)[0])"""
+    y = values.to_numpy(dtype=np.float64)
+    n = len(y)
+    return float(_X_ARR[n] @ y) / _X_SS[n]
+
+class SensorInputs(NamedTuple):
+    """Scorer inputs with the voltage fallback resolved once"""
+    voltage: Optional[float]
+    current: Optional[float]
+    rpm: Optional[float]
+    motor_temp: Optional[float]
+    env_temp: Optional[float]
+    humidity: Optional[float]
+
+def _normalize_inputs(data: Dict) -> SensorInputs:
+    """Extract scorer inputs from a sensor data dict"""
+    return SensorInputs(
+        data.get('esp_voltage') or data.get('plc_motor_voltage'),
+        data.get('esp_current'),
+        data.get('esp_rpm'),
+        data.get('plc_motor_temp'),
+        data.get('env_temp_c'),
+        data.get('env_humidity')
+    )
+
+def _history_key(recent_data: Optional[pd.DataFrame]) -> Optional[Tuple]:
+    """Identify a history window by row count and its first/last timestamps
+    
+    get_recent_data() returns a new DataFrame on every call, so the window
+    is compared by content rather than identity. Returns None if the window
+    has no timestamps to compare.
+    """
+    if recent_data is None or len(recent_data) == 0:
+        return ()
+    if 'timestamp' not in recent_data.columns:
+        return None
+    timestamps = recent_data['timestamp']
+    return (len(recent_data), timestamps.iloc[0], timestamps.iloc[-1])
+
 class HealthAnalyzer:
     def __init__(self, config):
         self.config = config
@@ -21,15 +67,26 @@ class HealthAnalyzer:
             'esp_current', 'esp_voltage', 'esp_rpm', 'env_temp_c', 
             'env_humidity', 'plc_motor_temp', 'plc_motor_voltage'
         ]
+        # History columns read by calculate_predictive_health
+        self.trend_columns = [
+            'timestamp', 'plc_motor_temp', 'esp_current', 'overall_health_score'
+        ]
+        
+        # Last computed health result, reused while inputs are unchanged
+        self._last_key = None
+        self._last_result = None
         logger.info("Health Analyzer initialized")
     
     def calculate_electrical_health(self, data: Dict) -> Tuple[float, List[str]]:
         """Calculate electrical health score (0-100) and identify issues"""
+        return self._electrical_health(_normalize_inputs(data))
+    
+    def _electrical_health(self, inputs: SensorInputs) -> Tuple[float, List[str]]:
         score = 100.0
         issues = []
         
-        voltage = data.get('esp_voltage') or data.get('plc_motor_voltage')
-        current = data.get('esp_current')
+        voltage = inputs.voltage
+        current = inputs.current
         
         if voltage is None and current is None:
             return 0.0, ["No electrical data available"]
@@ -65,12 +122,15 @@ class HealthAnalyzer:
     
     def calculate_thermal_health(self, data: Dict) -> Tuple[float, List[str]]:
         """Calculate thermal health score (0-100) and identify issues"""
+        return self._thermal_health(_normalize_inputs(data))
+    
+    def _thermal_health(self, inputs: SensorInputs) -> Tuple[float, List[str]]:
         score = 100.0
         issues = []
         
-        motor_temp = data.get('plc_motor_temp')
-        env_temp = data.get('env_temp_c')
-        humidity = data.get('env_humidity')
+        motor_temp = inputs.motor_temp
+        env_temp = inputs.env_temp
+        humidity = inputs.humidity
         
         if motor_temp is None and env_temp is None:
             return 0.0, ["No thermal data available"]
@@ -111,11 +171,14 @@ class HealthAnalyzer:
     
     def calculate_mechanical_health(self, data: Dict) -> Tuple[float, List[str]]:
         """Calculate mechanical health score (0-100) and identify issues"""
+        return self._mechanical_health(_normalize_inputs(data))
+    
+    def _mechanical_health(self, inputs: SensorInputs) -> Tuple[float, List[str]]:
         score = 100.0
         issues = []
         
-        rpm = data.get('esp_rpm')
-        current = data.get('esp_current')
+        rpm = inputs.rpm
+        current = inputs.current
         
         if rpm is None:
             return 0.0, ["No RPM data available"]
@@ -158,7 +221,7 @@ class HealthAnalyzer:
             if 'plc_motor_temp' in recent_data.columns:
                 temp_trend = recent_data['plc_motor_temp'].dropna().tail(10)
                 if len(temp_trend) >= 5:
-                    temp_slope = np.polyfit(range(len(temp_trend)), temp_trend, 1)[0]
+                    temp_slope = _trend_slope(temp_trend)
                     if temp_slope > 1.0:
                         score -= 30
                         issues.append(f"Rising temperature trend: +{temp_slope:.1f}°C/reading")
@@ -167,7 +230,7 @@ class HealthAnalyzer:
             if 'esp_current' in recent_data.columns:
                 current_trend = recent_data['esp_current'].dropna().tail(10)
                 if len(current_trend) >= 5:
-                    current_slope = np.polyfit(range(len(current_trend)), current_trend, 1)[0]
+                    current_slope = _trend_slope(current_trend)
                     if abs(current_slope) > 0.5:
                         score -= 25
                         issues.append(f"Current instability: ±{abs(current_slope):.1f}A/reading")
@@ -176,13 +239,13 @@ class HealthAnalyzer:
             if 'overall_health_score' in recent_data.columns:
                 health_trend = recent_data['overall_health_score'].dropna().tail(20)
                 if len(health_trend) >= 10:
-                    health_slope = np.polyfit(range(len(health_trend)), health_trend, 1)[0]
+                    health_slope = _trend_slope(health_trend)
                     if health_slope < -1.0:
                         score -= 35
                         issues.append(f"Health degradation: {health_slope:.1f} points/reading")
         
         except Exception as e:
-            logger.error(f"Error in predictive analysis: {e}")
+            logger.error("Error in predictive analysis: %s", e)
             issues.append("Predictive analysis error")
         
         return max(0.0, min(100.0, score)), issues
@@ -190,10 +253,18 @@ class HealthAnalyzer:
     def calculate_comprehensive_health(self, current_data: Dict, recent_data: pd.DataFrame = None) -> Dict:
         """Calculate comprehensive health scores with detailed breakdown"""
         
+        inputs = _normalize_inputs(current_data)
+        
+        # Sensors update slower than we poll - reuse the last result if nothing changed
+        history = _history_key(recent_data)
+        key = (inputs, history)
+        if self._last_result is not None and history is not None and key == self._last_key:
+            return {**self._last_result, 'timestamp': datetime.now().isoformat()}
+        
         # Calculate individual health components
-        electrical_score, electrical_issues = self.calculate_electrical_health(current_data)
-        thermal_score, thermal_issues = self.calculate_thermal_health(current_data)
-        mechanical_score, mechanical_issues = self.calculate_mechanical_health(current_data)
+        electrical_score, electrical_issues = self._electrical_health(inputs)
+        thermal_score, thermal_issues = self._thermal_health(inputs)
+        mechanical_score, mechanical_issues = self._mechanical_health(inputs)
         
         if recent_data is not None and len(recent_data) > 0:
             predictive_score, predictive_issues = self.calculate_predictive_health(recent_data)
@@ -209,7 +280,7 @@ class HealthAnalyzer:
         )
         
         # Calculate efficiency score
-        efficiency_score = self.calculate_efficiency_score(current_data)
+        efficiency_score = self._efficiency_score(inputs)
         
         # Determine overall status
         if overall_score >= 90:
@@ -225,7 +296,7 @@ class HealthAnalyzer:
             status = "Critical"
             status_class = "danger"
         
-        return {
+        result = {
             'overall_health_score': round(overall_score, 1),
             'electrical_health': round(electrical_score, 1),
             'thermal_health': round(thermal_score, 1),
@@ -239,14 +310,22 @@ class HealthAnalyzer:
                 'thermal': thermal_issues,
                 'mechanical': mechanical_issues,
                 'predictive': predictive_issues
-            }
+            },
+            'timestamp': datetime.now().isoformat()
         }
+        
+        self._last_key = key
+        self._last_result = result
+        return result
     
     def calculate_efficiency_score(self, data: Dict) -> float:
         """Calculate motor efficiency score"""
-        voltage = data.get('esp_voltage') or data.get('plc_motor_voltage', 0)
-        current = data.get('esp_current', 0)
-        rpm = data.get('esp_rpm', 0)
+        return self._efficiency_score(_normalize_inputs(data))
+    
+    def _efficiency_score(self, inputs: SensorInputs) -> float:
+        voltage = inputs.voltage
+        current = inputs.current
+        rpm = inputs.rpm
         
         if not all([voltage, current, rpm]):
             return 0.0
@@ -341,8 +420,11 @@ class HealthAnalyzer:
                 'confidence': 0.8
             })
         
-        # Sort by priority
+        # Sort by priority - one bucket per level keeps the original order within a level
         priority_order = {'CRITICAL': 4, 'HIGH': 3, 'MEDIUM': 2, 'LOW': 1}
-        recommendations.sort(key=lambda x: priority_order.get(x['priority'], 0), reverse=True)
+        buckets = ([], [], [], [], [])
+        for rec in recommendations:
+            buckets[priority_order.get(rec['priority'], 0)].append(rec)
+        recommendations = buckets[4] + buckets[3] + buckets[2] + buckets[1] + buckets[0]
         
         return recommendations[:10]
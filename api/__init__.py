@@ -4,5 +4,8 @@ RESTful API endpoints and WebSocket handlers
 """
 
 from .routes import setup_routes, setup_websocket_events
+from .emitter import EmitCoalescer
+from .serialization import OrjsonProvider, SocketIOJSON
 
-__all__ = ['setup_routes', 'setup_websocket_events']
+__all__ = ['setup_routes', 'setup_websocket_events', 'EmitCoalescer',
+           'OrjsonProvider', 'SocketIOJSON']
@@ -0,0 +1,105 @@
+"""
+WebSocket Emit Coalescer
+Buffers high-rate Socket.IO updates and sends the latest payload per event
+"""
+
+import time
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class EmitCoalescer:
+    """Coalesce state snapshot events (sensor/health/status updates).
+    
+    Events listed in min_intervals are throttled: the first update is sent
+    immediately, later ones within the interval collapse into the latest
+    payload. Other events are sent on the next flush.
+    
+    Events listed in lossy_events are skipped for clients whose outgoing
+    queue is above high_watermark, so a stalled browser cannot make the
+    server buffer updates without bound. It catches up on the next one.
+    
+    Only use this for events where a newer payload replaces an older one;
+    one-off notifications such as alerts must be emitted directly.
+    """
+    
+    def __init__(self, socketio, write_delay: float = 0.1,
+                 min_intervals: Optional[Dict[str, float]] = None,
+                 lossy_events: Iterable[str] = (), high_watermark: int = 32):
+        self.socketio = socketio
+        self.write_delay = write_delay
+        self.min_intervals = min_intervals or {}
+        self.lossy_events = frozenset(lossy_events)
+        self.high_watermark = high_watermark
+        self._pending: Dict[str, Any] = {}
+        self._last_emit: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._task = None
+        logger.info("Emit coalescer initialized (%.0f ms write delay)", write_delay * 1000)
+    
+    def start(self):
+        """Start the background flusher"""
+        if self._task is None:
+            self._task = self.socketio.start_background_task(self._run)
+    
+    def emit(self, event: str, payload: Any):
+        """Queue a payload - only the most recent one per event is sent"""
+        interval = self.min_intervals.get(event)
+        now = time.monotonic()
+        with self._lock:
+            send_now = (interval is not None and event not in self._pending
+                        and now - self._last_emit.get(event, float('-inf')) >= interval)
+            if send_now:
+                self._last_emit[event] = now
+            else:
+                self._pending[event] = payload
+        
+        if send_now:
+            self._send(event, payload)
+    
+    def flush(self, force: bool = False):
+        """Send pending payloads whose throttle interval has elapsed (all if forced)"""
+        now = time.monotonic()
+        due = {}
+        with self._lock:
+            for event in list(self._pending):
+                interval = self.min_intervals.get(event, 0.0)
+                if force or now - self._last_emit.get(event, float('-inf')) >= interval:
+                    due[event] = self._pending.pop(event)
+                    self._last_emit[event] = now
+        
+        for event, payload in due.items():
+            self._send(event, payload)
+    
+    def _send(self, event: str, payload: Any):
+        backlogged = self._backlogged_sids() if event in self.lossy_events else None
+        if backlogged:
+            logger.debug("Skipping %s for %s slow client(s)", event, len(backlogged))
+            self.socketio.emit(event, payload, skip_sid=backlogged)
+        else:
+            self.socketio.emit(event, payload)
+    
+    def _backlogged_sids(self) -> List[str]:
+        """Get clients whose outgoing packet queue is above the high watermark"""
+        try:
+            server = self.socketio.server
+            sockets = server.eio.sockets
+            backlogged = []
+            for sid, eio_sid in server.manager.get_participants('/', None):
+                socket = sockets.get(eio_sid)
+                if socket is not None and socket.queue.qsize() > self.high_watermark:
+                    backlogged.append(sid)
+            return backlogged
+        except Exception:
+            # Server internals differ between python-socketio versions - never block an emit
+            return []
+    
+    def _run(self):
+        while True:
+            self.socketio.sleep(self.write_delay)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error("Error flushing WebSocket updates: %s", e)
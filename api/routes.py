@@ -3,13 +3,68 @@ API Routes
 All REST API endpoints and WebSocket event handlers
 """
 
+import zlib
 import logging
+import pandas as pd
 from datetime import datetime
-from flask import request, jsonify, render_template
+from flask import request, jsonify, render_template, Response
 from flask_socketio import emit
 
+from .serialization import dumps_bytes
+
 logger = logging.getLogger(__name__)
 
+# Sensor data column -> chart field name for /api/historical-data
+_HISTORICAL_FIELDS = {
+    'timestamp': 'timestamp',
+    'esp_current': 'current',
+    'esp_voltage': 'voltage',
+    'esp_rpm': 'rpm',
+    'plc_motor_temp': 'motor_temp',
+    'env_temp_c': 'env_temp',
+    'env_humidity': 'humidity',
+    'overall_health_score': 'overall_health_score',
+    'electrical_health': 'electrical_health',
+    'thermal_health': 'thermal_health',
+    'mechanical_health': 'mechanical_health',
+    'predictive_health': 'predictive_health',
+    'efficiency_score': 'efficiency_score',
+    'power_consumption': 'power'
+}
+_STREAM_CHUNK_ROWS = 500
+
+def _chart_rows(page: pd.DataFrame) -> bytes:
+    """Serialize a page of sensor rows as comma-separated chart records"""
+    # Column-wise conversion, no per-row Series
+    frame = page.rename(columns=_HISTORICAL_FIELDS)
+    timestamps = pd.to_datetime(frame.pop('timestamp'))
+    frame = frame.fillna(0)
+    frame.insert(0, 'timestamp', timestamps.dt.strftime('%Y-%m-%dT%H:%M:%S')
+                 .where(timestamps.notna(), None))
+    return dumps_bytes(frame.to_dict(orient='records'))[1:-1]
+
+def _chart_json_chunks(first_rows: bytes, pages):
+    """Yield the {"data": [...]} document a page of rows at a time"""
+    yield b'{"data":[' + first_rows
+    try:
+        for page in pages:
+            yield b',' + _chart_rows(page)
+    except Exception as e:
+        # Headers are already sent - abort the response instead of ending it
+        # as valid but truncated JSON
+        logger.error("Error streaming historical data: %s", e)
+        raise
+    yield b']}'
+
+def _gzip_chunks(chunks):
+    """Compress a stream of byte chunks into a single gzip member"""
+    compressor = zlib.compressobj(wbits=31)  # 31 selects the gzip container
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
 def setup_routes(app, system_instance):
     """Setup all Flask routes"""
     
@@ -35,16 +90,36 @@ def setup_routes(app, system_instance):
                 return jsonify(result), 500
                 
         except Exception as e:
-            logger.error(f"Error in ESP data endpoint: {e}")
+            logger.error("Error in ESP data endpoint: %s", e)
+            return jsonify({'status': 'error', 'message': str(e)}), 500
+    
+    @app.route('/send-data/batch', methods=['POST'])
+    def receive_esp_batch():
+        """Receive several buffered ESP packets: {"packets": [...]}"""
+        try:
+            data = request.get_json()
+            packets = data.get('packets') if isinstance(data, dict) else None
+            if not packets or not isinstance(packets, list):
+                return jsonify({'status': 'error', 'message': 'No packets received'}), 400
+            
+            result = system_instance.esp_handler.process_esp_batch(system_instance, packets)
+            
+            if result['status'] == 'success':
+                return jsonify(result), 200
+            else:
+                return jsonify(result), 500
+                
+        except Exception as e:
+            logger.error("Error in ESP batch endpoint: %s", e)
             return jsonify({'status': 'error', 'message': str(e)}), 500
     
     @app.route('/api/current-data')
     def get_current_data():
         """Get current sensor readings with health data"""
         return jsonify({
-            'data': system_instance.latest_data,
+            'data': system_instance.latest_data.load(),
             'health': system_instance.latest_health_data,
-            'status': system_instance.system_status,
+            'status': system_instance.system_status.load(),
             'timestamp': datetime.now().isoformat()
         })
     
@@ -57,13 +132,10 @@ def setup_routes(app, system_instance):
     def get_recommendations():
         """Get current AI recommendations"""
         try:
-            recent_data = system_instance.db_manager.get_recent_data(hours=1)
-            recommendations = system_instance.health_analyzer.generate_recommendations(
-                system_instance.latest_health_data, system_instance.system_status
-            )
+            recommendations = system_instance.get_recommendations()
             return jsonify({'recommendations': recommendations})
         except Exception as e:
-            logger.error(f"Error generating recommendations: {e}")
+            logger.error("Error generating recommendations: %s", e)
             return jsonify({'error': str(e)}), 500
     
     @app.route('/api/historical-data')
@@ -71,35 +143,26 @@ def setup_routes(app, system_instance):
         """Get historical data for charts"""
         hours = request.args.get('hours', 24, type=int)
         try:
-            data = system_instance.db_manager.get_recent_data(hours=hours)
+            pages = system_instance.db_manager.iter_recent_data(
+                hours=hours, columns=list(_HISTORICAL_FIELDS), page_size=_STREAM_CHUNK_ROWS
+            )
             
-            if data.empty:
+            # Fetch and serialize the first page up front, so errors here still become a 500
+            first_page = next(pages, None)
+            if first_page is None:
                 return jsonify({'data': [], 'message': 'No data available'})
             
-            # Convert to JSON format for charts
-            chart_data = []
-            for _, row in data.iterrows():
-                chart_data.append({
-                    'timestamp': row['timestamp'].isoformat() if pd.notnull(row['timestamp']) else None,
-                    'current': row.get('esp_current', 0),
-                    'voltage': row.get('esp_voltage', 0),
-                    'rpm': row.get('esp_rpm', 0),
-                    'motor_temp': row.get('plc_motor_temp', 0),
-                    'env_temp': row.get('env_temp_c', 0),
-                    'humidity': row.get('env_humidity', 0),
-                    'overall_health_score': row.get('overall_health_score', 0),
-                    'electrical_health': row.get('electrical_health', 0),
-                    'thermal_health': row.get('thermal_health', 0),
-                    'mechanical_health': row.get('mechanical_health', 0),
-                    'predictive_health': row.get('predictive_health', 0),
-                    'efficiency_score': row.get('efficiency_score', 0),
-                    'power': row.get('power_consumption', 0)
-                })
+            # Stream the remaining pages as they are queried instead of loading them all
+            chunks = _chart_json_chunks(_chart_rows(first_page), pages)
+            headers = {'Vary': 'Accept-Encoding'}
+            if 'gzip' in request.accept_encodings:
+                chunks = _gzip_chunks(chunks)
+                headers['Content-Encoding'] = 'gzip'
             
-            return jsonify({'data': chart_data})
+            return Response(chunks, mimetype='application/json', headers=headers)
             
         except Exception as e:
-            logger.error(f"Error retrieving historical data: {e}")
+            logger.error("Error retrieving historical data: %s", e)
             return jsonify({'error': str(e)}), 500
     
     @app.route('/api/maintenance-alerts')
@@ -109,7 +172,7 @@ def setup_routes(app, system_instance):
             alerts = system_instance.db_manager.get_maintenance_alerts()
             return jsonify({'alerts': alerts})
         except Exception as e:
-            logger.error(f"Error retrieving alerts: {e}")
+            logger.error("Error retrieving alerts: %s", e)
             return jsonify({'error': str(e)}), 500
     
     @app.route('/api/acknowledge-alert/<int:alert_id>', methods=['POST'])
@@ -122,7 +185,7 @@ def setup_routes(app, system_instance):
             else:
                 return jsonify({'status': 'error', 'message': 'Alert not found'}), 404
         except Exception as e:
-            logger.error(f"Error acknowledging alert: {e}")
+            logger.error("Error acknowledging alert: %s", e)
             return jsonify({'status': 'error', 'message': str(e)}), 500
     
     @app.route('/api/motor-control', methods=['POST'])
@@ -130,7 +193,7 @@ def setup_routes(app, system_instance):
         """Motor control endpoint"""
         try:
             command = request.json.get('command')
-            logger.info(f"Motor control command: {command}")
+            logger.info("Motor control command: %s", command)
             
             # Log control action
             system_instance.db_manager.log_system_event(
@@ -139,14 +202,14 @@ def setup_routes(app, system_instance):
             
             return jsonify({'status': 'success', 'message': f'Command {command} executed'}), 200
         except Exception as e:
-            logger.error(f"Error in motor control: {e}")
+            logger.error("Error in motor control: %s", e)
             return jsonify({'status': 'error', 'message': str(e)}), 500
     
     @app.route('/api/system-status')
     def get_system_status():
         """Get complete system status"""
         return jsonify({
-            'system_status': system_instance.system_status,
+            'system_status': system_instance.system_status.load(),
             'esp_status': system_instance.esp_handler.get_esp_status(system_instance),
             'plc_status': system_instance.plc_manager.get_connection_status(),
             'health_summary': system_instance.latest_health_data
@@ -158,8 +221,8 @@ def setup_websocket_events(socketio, system_instance):
     @socketio.on('connect')
     def handle_connect():
         """Handle client connection"""
-        emit('status_update', system_instance.system_status)
-        emit('sensor_update', system_instance.latest_data)
+        emit('status_update', system_instance.system_status.load())
+        emit('sensor_update', system_instance.latest_data.load())
         emit('health_update', system_instance.latest_health_data)
         logger.info('Client connected to WebSocket')
     
@@ -171,18 +234,16 @@ def setup_websocket_events(socketio, system_instance):
     @socketio.on('request_update')
     def handle_update_request():
         """Handle manual update request"""
-        emit('sensor_update', system_instance.latest_data)
-        emit('status_update', system_instance.system_status)
+        emit('sensor_update', system_instance.latest_data.load())
+        emit('status_update', system_instance.system_status.load())
         emit('health_update', system_instance.latest_health_data)
     
     @socketio.on('request_recommendations')
     def handle_recommendations_request():
         """Handle recommendations request"""
         try:
-            recommendations = system_instance.health_analyzer.generate_recommendations(
-                system_instance.latest_health_data, system_instance.system_status
-            )
+            recommendations = system_instance.get_recommendations()
             emit('recommendations_update', recommendations)
         except Exception as e:
-            logger.error(f"Error generating recommendations via WebSocket: {e}")
+            logger.error("Error generating recommendations via WebSocket: %s", e)
             emit('error', {'message': 'Failed to generate recommendations'})
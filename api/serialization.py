@@ -0,0 +1,45 @@
+"""
+JSON Serialization
+orjson-backed encoding for Flask responses and Socket.IO packets
+"""
+
+import orjson
+from flask.json.provider import JSONProvider
+
+_ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+def _default(obj):
+    """Serialize types orjson does not handle natively"""
+    if hasattr(obj, 'isoformat'):  # pandas Timestamp and other date subclasses
+        return obj.isoformat()
+    if hasattr(obj, 'item'):  # numpy scalar types
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def dumps_bytes(obj) -> bytes:
+    """Serialize an object to JSON bytes"""
+    return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider used by jsonify() and request.get_json()"""
+    
+    def dumps(self, obj, **kwargs) -> str:
+        return dumps_bytes(obj).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj), mimetype='application/json')
+
+class SocketIOJSON:
+    """Drop-in for the json module used by python-socketio to encode packets"""
+    
+    @staticmethod
+    def dumps(obj, *args, **kwargs) -> str:
+        return dumps_bytes(obj).decode()
+    
+    @staticmethod
+    def loads(s, *args, **kwargs):
+        return orjson.loads(s)
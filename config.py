@@ -26,12 +26,26 @@ class Config:
     # Database
     DATABASE_URL: str = os.getenv('DATABASE_URL', 'sqlite:///data/motor_monitoring.db')
     CSV_EXPORT_PATH: str = 'data/sensor_data.csv'
+    DB_POOL_SIZE: int = int(os.getenv('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW: int = int(os.getenv('DB_MAX_OVERFLOW', 20))
+    DB_POOL_RECYCLE: int = 1800            # seconds
     
     # Connection Timeouts (seconds)
     ESP_TIMEOUT: int = 30
     PLC_TIMEOUT: int = 60
     DATA_CLEANUP_INTERVAL: int = 10
     
+    # Socket.IO async mode (threading, eventlet, gevent). When unset, `python main.py`
+    # uses threading and the gunicorn entry point (wsgi.py) auto-detects gevent
+    SOCKETIO_ASYNC_MODE: str = os.getenv('SOCKETIO_ASYNC_MODE') or None
+    
+    # WebSocket updates are coalesced and flushed at this interval (seconds)
+    SOCKETIO_WRITE_DELAY: float = float(os.getenv('SOCKETIO_WRITE_DELAY', 0.1))
+    # Minimum spacing of sensor/status/health updates per event (seconds)
+    SOCKETIO_MIN_EMIT_INTERVAL: float = float(os.getenv('SOCKETIO_MIN_EMIT_INTERVAL', 0.25))
+    # Sensor/health updates are dropped for clients with more packets queued than this
+    SOCKETIO_HIGH_WATERMARK: int = int(os.getenv('SOCKETIO_HIGH_WATERMARK', 32))
+    
     # OPTIMAL VALUES - 24V Motor System
     OPTIMAL_MOTOR_TEMP: float = 40.0       # Motor temp < 40°C
     OPTIMAL_VOLTAGE: float = 24.0          # 24V DC motor
@@ -4,24 +4,40 @@ Handles all database operations
 """
 
 import os
-import csv
 import logging
+import threading
 import pandas as pd
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import Dict, List
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, Session
+from typing import Dict, Iterator, List, Set
+from sqlalchemy import and_, create_engine, or_, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import scoped_session, sessionmaker, Session
 
 from .models import Base, SensorData, MaintenanceLog, SystemEvents
 
 logger = logging.getLogger(__name__)
 
+# Column order of the CSV export (timestamp is always the first column)
+_CSV_COLUMNS = ('esp_current', 'esp_voltage', 'esp_rpm',
+               'env_temp_c', 'env_humidity', 'plc_motor_temp',
+               'plc_motor_voltage', 'power_consumption',
+               'overall_health_score', 'electrical_health', 'thermal_health',
+               'mechanical_health', 'predictive_health', 'efficiency_score')
+_CSV_HEADER = 'timestamp,' + ','.join(_CSV_COLUMNS) + '\n'
+
+def _csv_field(value) -> str:
+    """Format a single numeric CSV field (missing values are left empty)"""
+    return '' if value is None else str(value)
+
 class DatabaseManager:
     def __init__(self, config):
         self.config = config
-        self.engine = create_engine(config.DATABASE_URL)
-        self.Session = sessionmaker(bind=self.engine)
-        logger.info(f"Database Manager initialized: {config.DATABASE_URL}")
+        self.engine = create_engine(config.DATABASE_URL, **self._engine_options(config))
+        self.Session = scoped_session(sessionmaker(bind=self.engine, expire_on_commit=False))
+        self._csv_fh = None
+        self._csv_lock = threading.Lock()
+        logger.info("Database Manager initialized: %s", config.DATABASE_URL)
     
     def initialize(self):
         """Initialize database tables"""
@@ -31,20 +47,50 @@ class DatabaseManager:
             
             # Create all tables
             Base.metadata.create_all(self.engine)
+            
+            # create_all() skips existing tables, so add newer indexes explicitly
+            for table in Base.metadata.sorted_tables:
+                for index in table.indexes:
+                    index.create(self.engine, checkfirst=True)
             logger.info("Database tables initialized")
         except Exception as e:
-            logger.error(f"Error initializing database: {e}")
+            logger.error("Error initializing database: %s", e)
             raise
     
+    @staticmethod
+    def _engine_options(config) -> Dict:
+        """Connection pool settings (in-memory SQLite uses a single shared connection)"""
+        url = make_url(config.DATABASE_URL)
+        if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+            return {}
+        
+        return {
+            'pool_size': config.DB_POOL_SIZE,
+            'max_overflow': config.DB_MAX_OVERFLOW,
+            'pool_recycle': config.DB_POOL_RECYCLE,
+            'pool_pre_ping': True
+        }
+    
     def get_session(self) -> Session:
         """Get database session"""
         return self.Session()
     
+    @contextmanager
+    def session_scope(self) -> Iterator[Session]:
+        """Provide a transactional scope around a series of operations"""
+        session = self.Session()
+        try:
+            yield session
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            self.Session.remove()
+    
     def save_sensor_data(self, data: Dict, connection_status: Dict = None) -> bool:
         """Save sensor data to database"""
         try:
-            session = self.get_session()
-            
             # Calculate power consumption
             current = data.get('esp_current', 0) or 0
             voltage = data.get('esp_voltage', 0) or data.get('plc_motor_voltage', 0) or 0
@@ -76,77 +122,104 @@ class DatabaseManager:
                 power_consumption=power_consumption
             )
             
-            session.add(sensor_reading)
-            session.commit()
-            session.close()
+            with self.session_scope() as session:
+                session.add(sensor_reading)
             
             # Export to CSV
             self.export_to_csv(data, power_consumption)
             return True
             
         except Exception as e:
-            logger.error(f"Error saving sensor data: {e}")
+            logger.error("Error saving sensor data: %s", e)
             return False
     
     def export_to_csv(self, data: Dict, power: float):
         """Export data to CSV file"""
         try:
-            file_exists = os.path.isfile(self.config.CSV_EXPORT_PATH)
-            with open(self.config.CSV_EXPORT_PATH, 'a', newline='') as csvfile:
-                fieldnames = ['timestamp', 'esp_current', 'esp_voltage', 'esp_rpm', 
-                             'env_temp_c', 'env_humidity', 'plc_motor_temp', 
-                             'plc_motor_voltage', 'power_consumption', 
-                             'overall_health_score', 'electrical_health', 'thermal_health',
-                             'mechanical_health', 'predictive_health', 'efficiency_score']
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                
-                if not file_exists:
-                    writer.writeheader()
-                
-                writer.writerow({
-                    'timestamp': datetime.now().isoformat(),
-                    'esp_current': data.get('esp_current', 0),
-                    'esp_voltage': data.get('esp_voltage', 0),
-                    'esp_rpm': data.get('esp_rpm', 0),
-                    'env_temp_c': data.get('env_temp_c', 0),
-                    'env_humidity': data.get('env_humidity', 0),
-                    'plc_motor_temp': data.get('plc_motor_temp', 0),
-                    'plc_motor_voltage': data.get('plc_motor_voltage', 0),
-                    'power_consumption': power,
-                    'overall_health_score': data.get('overall_health_score', 0),
-                    'electrical_health': data.get('electrical_health', 0),
-                    'thermal_health': data.get('thermal_health', 0),
-                    'mechanical_health': data.get('mechanical_health', 0),
-                    'predictive_health': data.get('predictive_health', 0),
-                    'efficiency_score': data.get('efficiency_score', 0)
-                })
+            values = [power if column == 'power_consumption' else data.get(column, 0)
+                      for column in _CSV_COLUMNS]
+            line = datetime.now().isoformat() + ',' + ','.join(map(_csv_field, values)) + '\n'
+            
+            with self._csv_lock:
+                if self._csv_fh is None:
+                    file_exists = os.path.isfile(self.config.CSV_EXPORT_PATH)
+                    self._csv_fh = open(self.config.CSV_EXPORT_PATH, 'a', newline='')
+                    if not file_exists:
+                        self._csv_fh.write(_CSV_HEADER)
+                self._csv_fh.write(line)
+                self._csv_fh.flush()
         except Exception as e:
-            logger.error(f"Error exporting to CSV: {e}")
+            logger.error("Error exporting to CSV: %s", e)
+    
+    def close(self):
+        """Close the CSV export file (it is reopened on the next export)"""
+        with self._csv_lock:
+            if self._csv_fh is not None:
+                try:
+                    self._csv_fh.close()
+                except Exception as e:
+                    logger.error("Error closing CSV export: %s", e)
+                finally:
+                    self._csv_fh = None
     
-    def get_recent_data(self, hours: int = 24) -> pd.DataFrame:
-        """Get recent sensor data"""
+    def get_recent_data(self, hours: int = 24, columns: List[str] = None) -> pd.DataFrame:
+        """Get recent sensor data, optionally limited to the given columns"""
         try:
-            session = self.get_session()
             cutoff_time = datetime.utcnow() - timedelta(hours=hours)
+            table = SensorData.__table__
+            selected = [table.c[name] for name in columns] if columns else [table]
             
-            query = session.query(SensorData).filter(
-                SensorData.timestamp >= cutoff_time
-            ).order_by(SensorData.timestamp.desc())
+            query = select(*selected).where(
+                table.c.timestamp >= cutoff_time
+            ).order_by(table.c.timestamp.desc())
             
-            data = pd.read_sql(query.statement, self.engine)
-            session.close()
-            return data
+            return pd.read_sql(query, self.engine)
         except Exception as e:
-            logger.error(f"Error retrieving recent data: {e}")
+            logger.error("Error retrieving recent data: %s", e)
             return pd.DataFrame()
     
+    def iter_recent_data(self, hours: int = 24, columns: List[str] = None,
+                         page_size: int = 500) -> Iterator[pd.DataFrame]:
+        """Yield recent sensor data newest first, one page of rows at a time
+        
+        Pages are fetched lazily with a keyset on (timestamp, id), so only one
+        page is held in memory. Errors are raised to the caller.
+        """
+        cutoff_time = datetime.utcnow() - timedelta(hours=hours)
+        table = SensorData.__table__
+        selected = [table.c[name] for name in columns] if columns else [table]
+        # The keyset columns are fetched even when the caller did not ask for them
+        extra = [column for column in (table.c.timestamp, table.c.id)
+                 if columns and column.name not in columns]
+        
+        query = select(*selected, *extra).where(
+            table.c.timestamp >= cutoff_time
+        ).order_by(table.c.timestamp.desc(), table.c.id.desc()).limit(page_size)
+        
+        page_query = query
+        while True:
+            page = pd.read_sql(page_query, self.engine)
+            if page.empty:
+                return
+            
+            last_timestamp = page['timestamp'].iloc[-1].to_pydatetime()
+            last_id = int(page['id'].iloc[-1])
+            yield page.drop(columns=[column.name for column in extra])
+            
+            if len(page) < page_size:
+                return
+            page_query = query.where(or_(
+                table.c.timestamp < last_timestamp,
+                and_(table.c.timestamp == last_timestamp, table.c.id < last_id)
+            ))
+    
     def get_maintenance_alerts(self) -> List[Dict]:
         """Get active maintenance alerts"""
         try:
-            session = self.get_session()
-            alerts = session.query(MaintenanceLog).filter(
-                MaintenanceLog.acknowledged == False
-            ).order_by(MaintenanceLog.timestamp.desc()).limit(10).all()
+            with self.session_scope() as session:
+                alerts = session.query(MaintenanceLog).filter(
+                    MaintenanceLog.acknowledged == False
+                ).order_by(MaintenanceLog.timestamp.desc()).limit(10).all()
             
             result = []
             for alert in alerts:
@@ -162,82 +235,96 @@ class DatabaseManager:
                     'action': alert.recommended_action
                 })
             
-            session.close()
             return result
         except Exception as e:
-            logger.error(f"Error retrieving maintenance alerts: {e}")
+            logger.error("Error retrieving maintenance alerts: %s", e)
             return []
     
     def save_alert(self, recommendation: Dict) -> bool:
         """Save maintenance alert to database"""
+        return self.save_alerts([recommendation])
+    
+    def save_alerts(self, recommendations: List[Dict]) -> bool:
+        """Save several maintenance alerts in a single transaction"""
         try:
-            session = self.get_session()
-            alert = MaintenanceLog(
-                alert_type=recommendation['type'],
-                category=recommendation['category'],
-                severity=recommendation['severity'],
-                priority=recommendation['priority'],
-                description=recommendation['description'],
-                prediction_confidence=recommendation['confidence'],
-                recommended_action=recommendation['action']
-            )
-            session.add(alert)
-            session.commit()
-            session.close()
+            alerts = [
+                MaintenanceLog(
+                    alert_type=recommendation['type'],
+                    category=recommendation['category'],
+                    severity=recommendation['severity'],
+                    priority=recommendation['priority'],
+                    description=recommendation['description'],
+                    prediction_confidence=recommendation['confidence'],
+                    recommended_action=recommendation['action']
+                )
+                for recommendation in recommendations
+            ]
+            with self.session_scope() as session:
+                # Plain INSERTs without identity-map bookkeeping - the objects are not reused
+                session.bulk_save_objects(alerts)
             return True
         except Exception as e:
-            logger.error(f"Error saving alert: {e}")
+            logger.error("Error saving alert: %s", e)
             return False
     
     def get_similar_alert(self, alert_type: str, minutes: int = 30) -> bool:
         """Check if similar alert exists within time window"""
         try:
-            session = self.get_session()
             cutoff_time = datetime.utcnow() - timedelta(minutes=minutes)
             
-            existing = session.query(MaintenanceLog).filter(
-                MaintenanceLog.alert_type == alert_type,
-                MaintenanceLog.acknowledged == False,
-                MaintenanceLog.timestamp > cutoff_time
-            ).first()
+            with self.session_scope() as session:
+                existing = session.query(MaintenanceLog).filter(
+                    MaintenanceLog.alert_type == alert_type,
+                    MaintenanceLog.acknowledged == False,
+                    MaintenanceLog.timestamp > cutoff_time
+                ).first()
             
-            session.close()
             return existing is not None
         except Exception as e:
-            logger.error(f"Error checking similar alert: {e}")
+            logger.error("Error checking similar alert: %s", e)
             return False
     
+    def get_open_alert_types(self, minutes: int = 30) -> Set[str]:
+        """Get the types of unacknowledged alerts raised within time window"""
+        try:
+            cutoff_time = datetime.utcnow() - timedelta(minutes=minutes)
+            
+            with self.session_scope() as session:
+                rows = session.query(MaintenanceLog.alert_type).filter(
+                    MaintenanceLog.acknowledged == False,
+                    MaintenanceLog.timestamp > cutoff_time
+                ).distinct().all()
+            
+            return {alert_type for (alert_type,) in rows}
+        except Exception as e:
+            logger.error("Error checking open alerts: %s", e)
+            return set()
+    
     def acknowledge_alert(self, alert_id: int) -> bool:
         """Acknowledge maintenance alert"""
         try:
-            session = self.get_session()
-            alert = session.query(MaintenanceLog).filter_by(id=alert_id).first()
-            if alert:
-                alert.acknowledged = True
-                session.commit()
-                session.close()
-                return True
-            else:
-                session.close()
+            with self.session_scope() as session:
+                alert = session.query(MaintenanceLog).filter_by(id=alert_id).first()
+                if alert:
+                    alert.acknowledged = True
+                    return True
                 return False
         except Exception as e:
-            logger.error(f"Error acknowledging alert: {e}")
+            logger.error("Error acknowledging alert: %s", e)
             return False
     
     def log_system_event(self, event_type: str, component: str, message: str, severity: str = 'INFO') -> bool:
         """Log system event"""
         try:
-            session = self.get_session()
             event = SystemEvents(
                 event_type=event_type,
                 component=component,
                 message=message,
                 severity=severity
             )
-            session.add(event)
-            session.commit()
-            session.close()
+            with self.session_scope() as session:
+                session.add(event)
             return True
         except Exception as e:
-            logger.error(f"Error logging system event: {e}")
+            logger.error("Error logging system event: %s", e)
             return False
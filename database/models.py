@@ -3,7 +3,7 @@ Database Models
 SQLAlchemy models for all database tables
 """
 
-from sqlalchemy import create_engine, Column, Integer, Float, String, DateTime, Boolean, Text
+from sqlalchemy import create_engine, Column, Integer, Float, String, DateTime, Boolean, Text, Index, text
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
 
@@ -13,7 +13,7 @@ class SensorData(Base):
     __tablename__ = 'sensor_data'
     
     id = Column(Integer, primary_key=True)
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime, default=datetime.utcnow, index=True)
     
     # ESP/Arduino Sensors
     esp_current = Column(Float)
@@ -50,6 +50,12 @@ class SensorData(Base):
 
 class MaintenanceLog(Base):
     __tablename__ = 'maintenance_log'
+    __table_args__ = (
+        # Open-alert lookups by type and time window only touch unacknowledged rows
+        Index('ix_mlog_open_type_ts', 'alert_type', 'timestamp',
+              sqlite_where=text('acknowledged = 0'),
+              postgresql_where=text('acknowledged = false')),
+    )
     
     id = Column(Integer, primary_key=True)
     timestamp = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,29 @@
+"""
+Gunicorn Configuration
+Serves the dashboard and Socket.IO through gevent: gunicorn -c gunicorn_conf.py wsgi:app
+"""
+
+import os
+import sys
+from dotenv import load_dotenv
+
+load_dotenv()
+
+bind = f"{os.getenv('FLASK_HOST', '0.0.0.0')}:{os.getenv('FLASK_PORT', 5000)}"
+
+# The worker monkey-patches the standard library before loading wsgi.py,
+# so the PLC socket and the background task sleeps yield cooperatively
+worker_class = 'geventwebsocket.gunicorn.workers.GeventWebSocketWorker'
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))
+
+# Socket.IO sessions and the background tasks live in a single process
+workers = 1
+
+# Preloading would start the background tasks before the worker is patched
+preload_app = False
+
+def worker_exit(server, worker):
+    """Close the PLC connection and CSV export file of the exiting worker"""
+    wsgi = sys.modules.get('wsgi')
+    if wsgi is not None:
+        wsgi.system.shutdown()
@@ -3,20 +3,38 @@ ESP/Arduino Data Handler
 Processes incoming data from ESP module
 """
 
+import time
 import logging
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, List
 from flask import request, jsonify
-from flask_socketio import SocketIO
 
 logger = logging.getLogger(__name__)
 
+# ESP payload field -> sensor data key
+_ESP_NUMERIC = (
+    ('esp_current', 'VAL1'),
+    ('esp_voltage', 'VAL2'),
+    ('esp_rpm', 'VAL3'),
+    ('env_temp_c', 'VAL4'),
+    ('env_humidity', 'VAL5'),
+    ('env_temp_f', 'VAL6'),
+    ('heat_index_c', 'VAL7'),
+    ('heat_index_f', 'VAL8')
+)
+_ESP_STRING = (
+    ('relay1_status', 'VAL9', 'OFF'),
+    ('relay2_status', 'VAL10', 'OFF'),
+    ('relay3_status', 'VAL11', 'OFF'),
+    ('combined_status', 'VAL12', 'NOR')
+)
+
 class ESPHandler:
-    def __init__(self, config, db_manager, health_analyzer, socketio: SocketIO):
+    def __init__(self, config, db_manager, health_analyzer, emitter):
         self.config = config
         self.db_manager = db_manager
         self.health_analyzer = health_analyzer
-        self.socketio = socketio
+        self.emitter = emitter
         logger.info("ESP Handler initialized")
     
     def process_esp_data(self, app_instance, data: Dict[str, Any]) -> Dict[str, Any]:
@@ -28,44 +46,50 @@ class ESPHandler:
             current_time = datetime.now()
             
             # Parse ESP data with validation
-            esp_data = {
-                'esp_current': self._safe_float(data.get('VAL1')),
-                'esp_voltage': self._safe_float(data.get('VAL2')),
-                'esp_rpm': self._safe_float(data.get('VAL3')),
-                'env_temp_c': self._safe_float(data.get('VAL4')),
-                'env_humidity': self._safe_float(data.get('VAL5')),
-                'env_temp_f': self._safe_float(data.get('VAL6')),
-                'heat_index_c': self._safe_float(data.get('VAL7')),
-                'heat_index_f': self._safe_float(data.get('VAL8')),
-                'relay1_status': data.get('VAL9', 'OFF'),
-                'relay2_status': data.get('VAL10', 'OFF'),
-                'relay3_status': data.get('VAL11', 'OFF'),
-                'combined_status': data.get('VAL12', 'NOR'),
-                'esp_connected': True
-            }
+            safe_float = self._safe_float
+            esp_data = {key: safe_float(data.get(field)) for key, field in _ESP_NUMERIC}
+            for key, field, default in _ESP_STRING:
+                esp_data[key] = data.get(field, default)
+            esp_data['esp_connected'] = True
             
             # Update app instance data
-            app_instance.latest_data.update(esp_data)
-            app_instance.system_status['esp_connected'] = True
-            app_instance.system_status['esp_last_seen'] = current_time.isoformat()
-            app_instance.system_status['last_update'] = current_time.isoformat()
+            combined_data = app_instance.latest_data.update(esp_data)
+            status = app_instance.system_status.update(
+                esp_connected=True,
+                esp_last_seen=current_time.isoformat(),
+                last_update=current_time.isoformat()
+            )
+            app_instance.esp_last_seen_mono = time.monotonic()
             
             # Save to database
-            combined_data = {**app_instance.latest_data}
-            self.db_manager.save_sensor_data(combined_data, app_instance.system_status)
+            self.db_manager.save_sensor_data(combined_data, status)
             
             # Emit real-time update
-            self.socketio.emit('sensor_update', combined_data)
+            self.emitter.emit('sensor_update', combined_data)
             
-            logger.info(f"ESP data processed: Current={esp_data.get('esp_current')}A, "
-                       f"Voltage={esp_data.get('esp_voltage')}V, RPM={esp_data.get('esp_rpm')}")
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("ESP data processed: Current=%sA, Voltage=%sV, RPM=%s",
+                            esp_data.get('esp_current'), esp_data.get('esp_voltage'), esp_data.get('esp_rpm'))
             
             return {'status': 'success', 'message': 'Data processed successfully'}
             
         except Exception as e:
-            logger.error(f"Error processing ESP data: {e}")
+            logger.error("Error processing ESP data: %s", e)
             return {'status': 'error', 'message': str(e)}
     
+    def process_esp_batch(self, app_instance, packets: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Process several buffered ESP packets in the order they were sampled"""
+        processed = 0
+        for packet in packets:
+            if self.process_esp_data(app_instance, packet)['status'] == 'success':
+                processed += 1
+        
+        return {
+            'status': 'success' if processed == len(packets) else 'error',
+            'message': f'{processed}/{len(packets)} packets processed',
+            'processed': processed
+        }
+    
     def _safe_float(self, value) -> float:
         """Safely convert value to float"""
         if value is None or value == '' or value == '0':
@@ -77,8 +101,10 @@ class ESPHandler:
     
     def get_esp_status(self, app_instance) -> Dict[str, Any]:
         """Get current ESP connection status"""
+        # Read both fields from one snapshot so they cannot straddle an update
+        status = app_instance.system_status.load()
         return {
-            'connected': app_instance.system_status['esp_connected'],
-            'last_seen': app_instance.system_status.get('esp_last_seen'),
-            'data_count': len([k for k in app_instance.latest_data.keys() if k.startswith('esp_')])
+            'connected': status['esp_connected'],
+            'last_seen': status.get('esp_last_seen'),
+            'data_count': len([k for k in app_instance.latest_data.load() if k.startswith('esp_')])
         }
@@ -9,20 +9,30 @@ from typing import Dict, Optional
 
 logger = logging.getLogger(__name__)
 
+# Engineering-unit scale per raw count (4095 = ~30V, Temperature = 0.05175 x Raw)
+_VOLTAGE_SCALE = 30.0 / 4095.0
+_TEMPERATURE_SCALE = 0.05175
+
+# D100 (voltage) and D102 (temperature) are read in one block starting at D100
+_HEAD_DEVICE = "D100"
+_BLOCK_SIZE = 3
+_VOLTAGE_OFFSET = 0
+_TEMPERATURE_OFFSET = 2
+
 class PLCManager:
     def __init__(self, config):
         self.config = config
         self.mc = pymcprotocol.Type3E()
         self.connected = False
         self.last_data = {}
-        logger.info(f"PLC Manager initialized for {config.PLC_IP}:{config.PLC_PORT}")
+        logger.info("PLC Manager initialized for %s:%s", config.PLC_IP, config.PLC_PORT)
     
     def connect(self) -> bool:
         """Connect to FX5U PLC"""
         try:
             if self.mc.connect(self.config.PLC_IP, self.config.PLC_PORT):
                 self.connected = True
-                logger.info(f"FX5U PLC connected: {self.config.PLC_IP}:{self.config.PLC_PORT}")
+                logger.info("FX5U PLC connected: %s:%s", self.config.PLC_IP, self.config.PLC_PORT)
                 return True
             else:
                 self.connected = False
@@ -30,7 +40,7 @@ class PLCManager:
                 return False
         except Exception as e:
             self.connected = False
-            logger.error(f"PLC connection error: {e}")
+            logger.error("PLC connection error: %s", e)
             return False
     
     def disconnect(self):
@@ -41,7 +51,7 @@ class PLCManager:
                 self.connected = False
                 logger.info("FX5U PLC disconnected")
         except Exception as e:
-            logger.error(f"Error disconnecting PLC: {e}")
+            logger.error("Error disconnecting PLC: %s", e)
     
     def convert_voltage(self, raw_value: int) -> float:
         """Convert D100 raw value to voltage (24V system)
@@ -56,7 +66,7 @@ class PLCManager:
             return 0.0
         
         # Scale for 24V system (assuming 4095 = ~30V max range)
-        voltage = (raw_value / 4095.0) * 30.0
+        voltage = raw_value * _VOLTAGE_SCALE
         return round(voltage, 1)
     
     def convert_temperature(self, raw_value: int) -> float:
@@ -72,7 +82,7 @@ class PLCManager:
         if raw_value <= 0:
             return 0.0
         
-        temperature = 0.05175 * raw_value
+        temperature = _TEMPERATURE_SCALE * raw_value
         return round(temperature, 1)
     
     def read_data(self) -> Dict[str, any]:
@@ -82,9 +92,10 @@ class PLCManager:
                 return {'plc_connected': False}
         
         try:
-            # Read raw values from FX5U registers
-            raw_d100 = self.mc.batchread_wordunits(headdevice="D100", readsize=1)  # Voltage
-            raw_d102 = self.mc.batchread_wordunits(headdevice="D102", readsize=1)  # Temperature
+            # Read D100-D102 in a single MC protocol request
+            raw = self.mc.batchread_wordunits(headdevice=_HEAD_DEVICE, readsize=_BLOCK_SIZE)
+            raw_d100 = raw[_VOLTAGE_OFFSET]      # Voltage
+            raw_d102 = raw[_TEMPERATURE_OFFSET]  # Temperature
             
             # Convert to engineering units
             motor_voltage = self.convert_voltage(raw_d100)
@@ -98,13 +109,13 @@ class PLCManager:
                 'raw_d102': raw_d102
             }
             
-            logger.debug(f"PLC readings: D100({raw_d100}) -> {motor_voltage}V, "
-                        f"D102({raw_d102}) -> {motor_temp}°C")
+            logger.debug("PLC readings: D100(%s) -> %sV, D102(%s) -> %s°C",
+                         raw_d100, motor_voltage, raw_d102, motor_temp)
             
             return self.last_data
             
         except Exception as e:
-            logger.error(f"Error reading PLC data: {e}")
+            logger.error("Error reading PLC data: %s", e)
             self.connected = False
             return {'plc_connected': False}
     
@@ -123,5 +134,5 @@ class PLCManager:
             test_data = self.read_data()
             return test_data.get('plc_connected', False)
         except Exception as e:
-            logger.error(f"PLC connection test failed: {e}")
+            logger.error("PLC connection test failed: %s", e)
             return False
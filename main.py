@@ -6,7 +6,11 @@ Version 4.0 - Modular Architecture
 """
 
 import os
-import threading
+import time
+import sched
+import logging
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from flask import Flask
 from flask_socketio import SocketIO
 from dotenv import load_dotenv
@@ -16,38 +20,60 @@ load_dotenv()
 
 # Import modules
 from config import Config, setup_logging
+from state import AtomicState
 from hardware.esp_handler import ESPHandler
 from hardware.plc_manager import PLCManager
 from ai.health_analyzer import HealthAnalyzer
 from database.manager import DatabaseManager
 from api.routes import setup_routes, setup_websocket_events
+from api.emitter import EmitCoalescer
+from api.serialization import OrjsonProvider, SocketIOJSON
 
 # Setup logging
 logger = setup_logging()
 
 class MotorMonitoringSystem:
-    def __init__(self):
+    def __init__(self, default_async_mode=None):
         self.config = Config()
         self.app = Flask(__name__)
         self.app.config['SECRET_KEY'] = 'motor_monitoring_secret'
-        self.socketio = SocketIO(self.app, cors_allowed_origins="*")
+        self.app.json = OrjsonProvider(self.app)
+        self.socketio = SocketIO(
+            self.app, cors_allowed_origins="*", json=SocketIOJSON,
+            async_mode=self.config.SOCKETIO_ASYNC_MODE or default_async_mode
+        )
+        throttle = self.config.SOCKETIO_MIN_EMIT_INTERVAL
+        self.emitter = EmitCoalescer(
+            self.socketio, self.config.SOCKETIO_WRITE_DELAY,
+            min_intervals={'sensor_update': throttle, 'status_update': throttle, 'health_update': throttle},
+            lossy_events=('sensor_update', 'health_update'),
+            high_watermark=self.config.SOCKETIO_HIGH_WATERMARK
+        )
         
         # Initialize components
         self.db_manager = DatabaseManager(self.config)
         self.plc_manager = PLCManager(self.config)
+        # The MC protocol client is not thread-safe, so PLC I/O gets one worker
+        self._plc_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='plc-io')
+        self._plc_future = None
         self.health_analyzer = HealthAnalyzer(self.config)
-        self.esp_handler = ESPHandler(self.config, self.db_manager, self.health_analyzer, self.socketio)
+        self.esp_handler = ESPHandler(self.config, self.db_manager, self.health_analyzer, self.emitter)
         
         # System state
-        self.latest_data = {}
-        self.system_status = {
+        self.latest_data = AtomicState()
+        self.system_status = AtomicState({
             'esp_connected': False,
             'plc_connected': False,
             'ai_model_status': 'Initializing',
             'last_update': None,
             'esp_last_seen': None,
             'plc_last_seen': None
-        }
+        })
+        # Monotonic clock readings of the last ESP/PLC data (used for timeouts)
+        self.esp_last_seen_mono = None
+        self.plc_last_seen_mono = None
+        # Last status snapshot sent to clients by the connection monitor
+        self._last_emitted_status = None
         self.latest_health_data = {
             'overall_health_score': 0,
             'electrical_health': 0,
@@ -59,6 +85,9 @@ class MotorMonitoringSystem:
             'status_class': 'secondary',
             'issues': {}
         }
+        # Bumped whenever latest_health_data is replaced
+        self.health_version = 0
+        self._recommendations = (None, [])
         
         # Setup routes and websocket events
         setup_routes(self.app, self)
@@ -68,130 +97,137 @@ class MotorMonitoringSystem:
     
     def start_background_tasks(self):
         """Start all background monitoring tasks"""
-        # PLC data collection
-        plc_thread = threading.Thread(target=self._plc_data_collector, daemon=True)
-        plc_thread.start()
-        
-        # Health analysis
-        health_thread = threading.Thread(target=self._health_analysis_task, daemon=True)
-        health_thread.start()
+        # Coalesced WebSocket updates
+        self.emitter.start()
         
-        # Connection monitoring
-        monitor_thread = threading.Thread(target=self._connection_monitor, daemon=True)
-        monitor_thread.start()
+        # PLC collection, health analysis and connection monitoring share one scheduler
+        self.socketio.start_background_task(self._run_scheduler)
         
         logger.info("Background tasks started")
     
+    def _run_scheduler(self):
+        """Background task running the periodic jobs from a single timer queue"""
+        scheduler = sched.scheduler(time.monotonic, self.socketio.sleep)
+        
+        def every(interval, job):
+            def run():
+                scheduler.enter(interval, 1, run)
+                job()
+            scheduler.enter(0, 1, run)
+        
+        every(5, self._plc_data_collector)
+        every(15, self._health_analysis_task)
+        every(self.config.DATA_CLEANUP_INTERVAL, self._connection_monitor)
+        scheduler.run()
+    
     def _plc_data_collector(self):
-        """Background task for PLC data collection"""
-        import time
-        from datetime import datetime
+        """Scheduled job: start a PLC read unless the previous one is still running"""
+        if self._plc_future is not None and not self._plc_future.done():
+            return
         
-        while True:
-            try:
-                plc_data = self.plc_manager.read_data()
-                current_time = datetime.now()
-                
-                if plc_data and plc_data.get('plc_connected', False):
-                    self.latest_data.update(plc_data)
-                    self.system_status['plc_connected'] = True
-                    self.system_status['plc_last_seen'] = current_time.isoformat()
-                    logger.debug(f"PLC data updated: {plc_data}")
-                else:
-                    if self.system_status['plc_connected']:
-                        logger.warning("PLC connection lost")
-                    self.system_status['plc_connected'] = False
-                    self.latest_data['plc_connected'] = False
-                    self.latest_data['plc_motor_temp'] = None
-                    self.latest_data['plc_motor_voltage'] = None
-            except Exception as e:
-                logger.error(f"Error in PLC data collection: {e}")
-                self.system_status['plc_connected'] = False
+        # The blocking register read runs on the PLC executor so it cannot delay the other jobs
+        self._plc_future = self._plc_executor.submit(self.plc_manager.read_data)
+        self._plc_future.add_done_callback(self._on_plc_data)
+    
+    def _on_plc_data(self, future):
+        """Apply the result of a PLC read (called on the PLC executor thread)"""
+        try:
+            plc_data = future.result()
+            current_time = datetime.now()
             
-            time.sleep(5)
+            if plc_data and plc_data.get('plc_connected', False):
+                self.latest_data.update(plc_data)
+                self.system_status.update(
+                    plc_connected=True, plc_last_seen=current_time.isoformat()
+                )
+                self.plc_last_seen_mono = time.monotonic()
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("PLC data updated: %s", plc_data)
+            else:
+                if self.system_status['plc_connected']:
+                    logger.warning("PLC connection lost")
+                self.system_status.update(plc_connected=False)
+                self.latest_data.update(
+                    plc_connected=False, plc_motor_temp=None, plc_motor_voltage=None
+                )
+        except Exception as e:
+            logger.error("Error in PLC data collection: %s", e)
+            self.system_status.update(plc_connected=False)
     
     def _health_analysis_task(self):
-        """Background task for AI health analysis"""
-        import time
-        
-        while True:
-            try:
-                if len(self.latest_data) > 0:
-                    # Get recent data for analysis
-                    recent_data = self.db_manager.get_recent_data(hours=2)
-                    
-                    # Calculate comprehensive health
-                    self.latest_health_data = self.health_analyzer.calculate_comprehensive_health(
-                        self.latest_data, recent_data
-                    )
-                    
-                    # Generate recommendations
-                    recommendations = self.health_analyzer.generate_recommendations(
-                        self.latest_health_data, self.system_status
-                    )
-                    
-                    # Emit updates via WebSocket
-                    self.socketio.emit('health_update', self.latest_health_data)
-                    self.socketio.emit('recommendations_update', recommendations)
-                    
-                    # Save critical alerts
-                    self._save_critical_alerts(recommendations)
-                    
-                    self.system_status['ai_model_status'] = 'Active'
-                else:
-                    self.system_status['ai_model_status'] = 'Waiting for data'
-            except Exception as e:
-                logger.error(f"Error in health analysis: {e}")
-                self.system_status['ai_model_status'] = 'Error'
-            
-            time.sleep(15)
+        """Scheduled job: AI health analysis"""
+        try:
+            if len(self.latest_data) > 0:
+                # Get recent data for analysis
+                recent_data = self.db_manager.get_recent_data(
+                    hours=2, columns=self.health_analyzer.trend_columns
+                )
+                
+                # Calculate comprehensive health
+                self.latest_health_data = self.health_analyzer.calculate_comprehensive_health(
+                    self.latest_data.load(), recent_data
+                )
+                self.health_version += 1
+                
+                # Generate recommendations
+                recommendations = self.get_recommendations()
+                
+                # Emit updates via WebSocket
+                self.emitter.emit('health_update', self.latest_health_data)
+                self.emitter.emit('recommendations_update', recommendations)
+                
+                # Save critical alerts
+                self._save_critical_alerts(recommendations)
+                
+                self.system_status.update(ai_model_status='Active')
+            else:
+                self.system_status.update(ai_model_status='Waiting for data')
+        except Exception as e:
+            logger.error("Error in health analysis: %s", e)
+            self.system_status.update(ai_model_status='Error')
     
     def _connection_monitor(self):
-        """Background task for connection monitoring"""
-        import time
-        from datetime import datetime
-        
-        while True:
-            try:
-                current_time = datetime.now()
-                
-                # Check ESP timeout
-                if self.system_status['esp_last_seen']:
-                    esp_last_seen = datetime.fromisoformat(self.system_status['esp_last_seen'])
-                    esp_timeout = (current_time - esp_last_seen).total_seconds()
-                    
-                    if esp_timeout > self.config.ESP_TIMEOUT:
-                        if self.system_status['esp_connected']:
-                            logger.warning(f"ESP timeout ({esp_timeout:.0f}s)")
-                            self.system_status['esp_connected'] = False
-                            self._clear_esp_data()
-                            self.socketio.emit('connection_lost', {
-                                'component': 'ESP',
-                                'message': 'ESP connection timeout',
-                                'timeout': esp_timeout
-                            })
+        """Scheduled job: connection monitoring"""
+        try:
+            now = time.monotonic()
+            
+            # Check ESP timeout
+            if self.esp_last_seen_mono is not None:
+                esp_timeout = now - self.esp_last_seen_mono
                 
-                # Check PLC timeout
-                if self.system_status['plc_last_seen']:
-                    plc_last_seen = datetime.fromisoformat(self.system_status['plc_last_seen'])
-                    plc_timeout = (current_time - plc_last_seen).total_seconds()
-                    
-                    if plc_timeout > self.config.PLC_TIMEOUT:
-                        if self.system_status['plc_connected']:
-                            logger.warning(f"PLC timeout ({plc_timeout:.0f}s)")
-                            self.system_status['plc_connected'] = False
-                            self._clear_plc_data()
-                            self.socketio.emit('connection_lost', {
-                                'component': 'PLC',
-                                'message': 'PLC connection timeout',
-                                'timeout': plc_timeout
-                            })
+                if esp_timeout > self.config.ESP_TIMEOUT:
+                    if self.system_status['esp_connected']:
+                        logger.warning("ESP timeout (%.0fs)", esp_timeout)
+                        self.system_status.update(esp_connected=False)
+                        self._clear_esp_data()
+                        self.socketio.emit('connection_lost', {
+                            'component': 'ESP',
+                            'message': 'ESP connection timeout',
+                            'timeout': esp_timeout
+                        })
+            
+            # Check PLC timeout
+            if self.plc_last_seen_mono is not None:
+                plc_timeout = now - self.plc_last_seen_mono
                 
-                self.socketio.emit('status_update', self.system_status)
-            except Exception as e:
-                logger.error(f"Error in connection monitor: {e}")
+                if plc_timeout > self.config.PLC_TIMEOUT:
+                    if self.system_status['plc_connected']:
+                        logger.warning("PLC timeout (%.0fs)", plc_timeout)
+                        self.system_status.update(plc_connected=False)
+                        self._clear_plc_data()
+                        self.socketio.emit('connection_lost', {
+                            'component': 'PLC',
+                            'message': 'PLC connection timeout',
+                            'timeout': plc_timeout
+                        })
             
-            time.sleep(self.config.DATA_CLEANUP_INTERVAL)
+            # Snapshots are only replaced on change, so identity tells if anything is new
+            status = self.system_status.load()
+            if status is not self._last_emitted_status:
+                self.emitter.emit('status_update', status)
+                self._last_emitted_status = status
+        except Exception as e:
+            logger.error("Error in connection monitor: %s", e)
     
     def _clear_esp_data(self):
         """Clear ESP-related data on timeout"""
@@ -199,42 +235,57 @@ class MotorMonitoringSystem:
                    'env_humidity', 'env_temp_f', 'heat_index_c', 'heat_index_f',
                    'relay1_status', 'relay2_status', 'relay3_status', 'combined_status']
         
-        for key in esp_keys:
-            if key in self.latest_data:
-                self.latest_data[key] = None
+        current = self.latest_data.load()
+        self.latest_data.update({key: None for key in esp_keys if key in current})
     
     def _clear_plc_data(self):
         """Clear PLC-related data on timeout"""
-        self.latest_data['plc_motor_temp'] = None
-        self.latest_data['plc_motor_voltage'] = None
-        self.latest_data['plc_connected'] = False
+        self.latest_data.update(
+            plc_motor_temp=None, plc_motor_voltage=None, plc_connected=False
+        )
+    
+    def get_recommendations(self):
+        """Get recommendations for the current health data (cached until it changes)"""
+        status = self.system_status.load()
+        key = (self.health_version, status['esp_connected'], status['plc_connected'])
+        cached_key, recommendations = self._recommendations
+        if cached_key != key:
+            recommendations = self.health_analyzer.generate_recommendations(
+                self.latest_health_data, status
+            )
+            self._recommendations = (key, recommendations)
+        return recommendations
     
     def _save_critical_alerts(self, recommendations):
         """Save critical alerts to database"""
-        from datetime import datetime, timedelta
+        critical = [rec for rec in recommendations
+                    if rec['severity'] in ['CRITICAL', 'HIGH'] and rec['confidence'] > 0.8]
+        if not critical:
+            return
         
-        for rec in recommendations:
-            if rec['severity'] in ['CRITICAL', 'HIGH'] and rec['confidence'] > 0.8:
-                # Check if similar alert exists
-                existing = self.db_manager.get_similar_alert(
-                    rec['type'], minutes=30
-                )
-                
-                if not existing:
-                    self.db_manager.save_alert(rec)
-                    self.socketio.emit('maintenance_alert', {
-                        'type': rec['type'],
-                        'severity': rec['severity'],
-                        'message': rec['description'],
-                        'confidence': rec['confidence']
-                    })
+        # Skip alert types that already have an open alert (one query for all of them)
+        open_types = self.db_manager.get_open_alert_types(minutes=30)
+        new_alerts = []
+        for rec in critical:
+            if rec['type'] not in open_types:
+                new_alerts.append(rec)
+                open_types.add(rec['type'])
+        
+        if new_alerts and self.db_manager.save_alerts(new_alerts):
+            for rec in new_alerts:
+                self.socketio.emit('maintenance_alert', {
+                    'type': rec['type'],
+                    'severity': rec['severity'],
+                    'message': rec['description'],
+                    'confidence': rec['confidence']
+                })
     
-    def run(self):
-        """Run the application"""
+    def start(self):
+        """Initialize storage, connect hardware and start background tasks"""
         logger.info("Starting AI Motor Monitoring System v4.0")
         logger.info("=== Modular Architecture ===")
-        logger.info(f"PLC: {self.config.PLC_IP}:{self.config.PLC_PORT}")
-        logger.info(f"Server: {self.config.FLASK_HOST}:{self.config.FLASK_PORT}")
+        logger.info("PLC: %s:%s", self.config.PLC_IP, self.config.PLC_PORT)
+        logger.info("Socket.IO async mode: %s", self.socketio.async_mode)
         
         # Initialize database
         self.db_manager.initialize()
@@ -244,6 +295,16 @@ class MotorMonitoringSystem:
         
         # Start background tasks
         self.start_background_tasks()
+    
+    def shutdown(self):
+        """Disconnect hardware and release open files"""
+        self.plc_manager.disconnect()
+        self.db_manager.close()
+    
+    def run(self):
+        """Run the application on the built-in development server"""
+        self.start()
+        logger.info("Server: %s:%s", self.config.FLASK_HOST, self.config.FLASK_PORT)
         
         try:
             # Run Flask application
@@ -256,11 +317,20 @@ class MotorMonitoringSystem:
             )
         except KeyboardInterrupt:
             logger.info("Shutting down system...")
-            self.plc_manager.disconnect()
         except Exception as e:
-            logger.error(f"Application error: {e}")
-            self.plc_manager.disconnect()
+            logger.error("Application error: %s", e)
+        finally:
+            self.shutdown()
 
-if __name__ == '__main__':
+def create_app():
+    """Create and start the system for a WSGI server (see wsgi.py)"""
     system = MotorMonitoringSystem()
+    system.start()
+    system.app.extensions['motor_monitoring'] = system
+    return system.app
+
+if __name__ == '__main__':
+    # gevent is installed for gunicorn, but the development server does not
+    # monkey-patch, so keep it on plain threads unless configured otherwise
+    system = MotorMonitoringSystem(default_async_mode='threading')
     system.run()
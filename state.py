@@ -0,0 +1,50 @@
+"""
+Shared System State
+Copy-on-write state shared by background tasks and request handlers
+"""
+
+import threading
+from typing import Any, Dict
+
+class AtomicState:
+    """Dict-like state published as immutable snapshots.
+    
+    Writers build a new dict under a lock and swap it in, so readers never
+    see a half-applied update. Snapshots returned by load() and update()
+    are shared and must be treated as read-only.
+    """
+    
+    def __init__(self, initial: Dict[str, Any] = None):
+        self._snapshot = dict(initial or {})
+        self._lock = threading.Lock()
+    
+    def load(self) -> Dict[str, Any]:
+        """Get the current snapshot"""
+        return self._snapshot
+    
+    def update(self, patch: Dict[str, Any] = None, **values) -> Dict[str, Any]:
+        """Publish a new snapshot with the given keys replaced and return it.
+        
+        If no value actually changes the current snapshot is kept, so callers
+        can detect changes by comparing snapshot identity.
+        """
+        changes = {**(patch or {}), **values}
+        with self._lock:
+            current = self._snapshot
+            if all(key in current and current[key] == value for key, value in changes.items()):
+                return current
+            snapshot = {**current, **changes}
+            self._snapshot = snapshot
+        return snapshot
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._snapshot.get(key, default)
+    
+    def __getitem__(self, key: str) -> Any:
+        return self._snapshot[key]
+    
+    def __contains__(self, key: str) -> bool:
+        return key in self._snapshot
+    
+    def __len__(self) -> int:
+        return len(self._snapshot)
@@ -4,13 +4,36 @@ ESP/Arduino Data Simulator - Standalone Version
 Sends realistic fake sensor data to the motor monitoring system
 """
 
+import math
 import time
-import random
+import signal
+import asyncio
+import contextlib
 import requests
 import json
+import numpy as np
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import logging
 from datetime import datetime
 
+# aiohttp is optional - without it packets are sent with requests on worker threads
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
+# orjson is optional - it encodes request bodies several times faster than json
+try:
+    import orjson
+    
+    def _encode(payload):
+        return orjson.dumps(payload)
+except ImportError:
+    def _encode(payload):
+        return json.dumps(payload, separators=(',', ':')).encode()
+
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
@@ -18,10 +41,89 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Simulated channels and their random variation (±) around the base values
+_CHANNELS = ('voltage', 'current', 'rpm', 'temp_c', 'humidity')
+_VARIATION = np.array([2.0, 1.5, 150.0, 8.0, 15.0])
+
+# One generator shared by all simulators in the process (seed it with seed_rng()).
+# Generators are not thread-safe, so packets are only generated on the event loop thread.
+_RNG = np.random.default_rng()
+
+def seed_rng(seed):
+    """Reseed the shared generator for reproducible runs"""
+    global _RNG
+    _RNG = np.random.default_rng(seed)
+
+# Request timeout and connection pool size shared by both transports (aiohttp
+# and requests), so single and fleet runs fail the same way against a slow
+# server. A fleet pool grows to one connection per device beyond this size.
+_REQUEST_TIMEOUT = 10.0
+_MAX_CONNECTIONS = 32
+_KEEPALIVE_TIMEOUT = 60
+
+# ESP packet skeleton - each packet is a copy with VAL1-VAL12 filled in positionally
+_PACKET_TEMPLATE = {"TYPE": "ADU_TEXT", **{f"VAL{i}": "" for i in range(1, 13)}}
+_FIELD_KEYS = tuple(_PACKET_TEMPLATE)[1:]   # VAL1-VAL12
+# VAL1-VAL8: current, voltage, RPM, temp C, humidity, temp F, heat index C/F
+_VALUE_FORMAT = "{:.2f}|{:.2f}|{:d}|{:.1f}|{:.1f}|{:.1f}|{:.1f}|{:.1f}".format
+# VAL9-VAL12 for each relay bitmask (bit 0: current, bit 1: voltage, bit 2: temperature);
+# any tripped relay puts the combined status in the BUZ alarm state
+_RELAY_STATE = ("OFF", "ON")
+_RELAY_FIELDS = tuple(
+    (_RELAY_STATE[mask & 1], _RELAY_STATE[(mask >> 1) & 1], _RELAY_STATE[(mask >> 2) & 1],
+     "BUZ" if mask else "NOR")
+    for mask in range(8)
+)
+
+# Transient failures are retried with exponential backoff (0.2s, 0.4s, ... up to 2s).
+# A POST is only retried if it never reached the server (connect error) or the
+# server rejected it with one of _RETRY_STATUSES - never after a read error or
+# timeout, which could duplicate a packet the server already stored.
+_RETRY_ATTEMPTS = 3  # Total attempts per send, including the first
+_RETRY_BACKOFF = 0.1
+_RETRY_MAX_DELAY = 2.0
+_RETRY_STATUSES = (502, 503, 504)
+# Only the start of an error body is read and printed
+_ERROR_BODY_LIMIT = 200
+
+def create_http_session(pool_maxsize=_MAX_CONNECTIONS):
+    """Keep-alive requests session with pooled, retrying connections
+    
+    One session can be shared by several simulators (see run_fleet_simulation)
+    so they reuse the same sockets instead of opening a pool each.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=2, pool_maxsize=pool_maxsize,
+        max_retries=Retry(
+            total=_RETRY_ATTEMPTS - 1, read=0, other=0,
+            backoff_factor=_RETRY_BACKOFF * 2,
+            status_forcelist=_RETRY_STATUSES, allowed_methods=frozenset({'POST'}),
+            raise_on_status=False
+        )
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
 class ESPSimulator:
-    def __init__(self, server_url="http://localhost:5000"):
+    def __init__(self, server_url="http://localhost:5000", batch_size=1, log_every=1,
+                 http_session=None):
         self.server_url = server_url
         self.endpoint = f"{server_url}/send-data"
+        self.batch_endpoint = f"{server_url}/send-data/batch"
+        self.batch_size = max(1, batch_size)
+        
+        # Progress is reported every log_every ticks; above 1 the per-packet
+        # lines are dropped and request latencies are aggregated instead
+        self.log_every = max(1, log_every)
+        self._latencies = []
+        
+        # Keep-alive session so packets reuse pooled TCP connections
+        # (an externally provided session is shared and not closed here)
+        self._owns_session = http_session is None
+        self.session = create_http_session() if self._owns_session else http_session
+        self._headers = {'Content-Type': 'application/json'}
         
         # Target optimal values with realistic variation
         self.base_values = {
@@ -32,19 +134,39 @@ class ESPSimulator:
             'humidity': 45.0,     # 45% ±15%
         }
         
+        # Reused sample buffer (one row per packet); grows to the largest tick
+        self._buf = np.empty((self.batch_size, len(_CHANNELS)))
+        
+        # Set while run_simulation() is active
+        self._loop = None
+        self._stop = None
+        
         print(f"🔌 ESP Simulator initialized")
         print(f"🌐 Target server: {self.endpoint}")
+        if self.batch_size > 1:
+            print(f"📦 Batching {self.batch_size} packets per request ({self.batch_endpoint})")
         print(f"📊 Base values: 24V, 6.25A, 2650 RPM, 26°C, 45%RH")
     
     def generate_sensor_data(self):
         """Generate realistic sensor data with random variations"""
+        return self.generate_sensor_data_batch(1)[0]
+    
+    def generate_sensor_data_batch(self, n):
+        """Generate n packets of sensor data in one vectorized pass"""
         
-        # Add realistic variations
-        voltage = self.base_values['voltage'] + random.uniform(-2.0, 2.0)
-        current = max(0, self.base_values['current'] + random.uniform(-1.5, 1.5))
-        rpm = max(0, self.base_values['rpm'] + random.uniform(-150, 150))
-        temp_c = self.base_values['temp_c'] + random.uniform(-8.0, 8.0)
-        humidity = max(0, min(100, self.base_values['humidity'] + random.uniform(-15.0, 15.0)))
+        # Add realistic variations (one row per packet, one column per channel),
+        # drawn into the preallocated buffer and scaled in place
+        if len(self._buf) < n:
+            self._buf = np.empty((n, len(_CHANNELS)))
+        samples = self._buf[:n]
+        _RNG.random(out=samples)
+        base = np.array([self.base_values[channel] for channel in _CHANNELS])
+        samples *= 2 * _VARIATION
+        samples += base - _VARIATION
+        voltage, current, rpm, temp_c, humidity = samples.T
+        current = np.maximum(current, 0)
+        rpm = np.maximum(rpm, 0)
+        humidity = np.clip(humidity, 0, 100)
         
         # Convert temperature to Fahrenheit
         temp_f = (temp_c * 9/5) + 32
@@ -53,51 +175,54 @@ class ESPSimulator:
         heat_index_c = temp_c + (0.01 * humidity * (temp_c - 14.55))
         heat_index_f = (heat_index_c * 9/5) + 32
         
-        # Generate relay statuses (mostly OFF with occasional ON)
-        relay1 = "ON" if current > 8.0 else "OFF"  # Current protection
-        relay2 = "ON" if voltage < 22.0 or voltage > 26.0 else "OFF"  # Voltage protection
-        relay3 = "ON" if temp_c > 35.0 else "OFF"  # Temperature protection
+        # Generate relay statuses (mostly OFF with occasional ON) as one bitmask per packet
+        relay_mask = ((current > 8.0)                                  # Current protection
+                      + 2 * ((voltage < 22.0) | (voltage > 26.0))      # Voltage protection
+                      + 4 * (temp_c > 35.0))                           # Temperature protection
         
-        # Combined status
-        if relay1 == "ON" or relay2 == "ON" or relay3 == "ON":
-            combined = "BUZ"  # Alarm state
-        else:
-            combined = "NOR"  # Normal state
-        
-        # Format data as expected by the system
-        data = {
-            "TYPE": "ADU_TEXT",
-            "VAL1": f"{current:.2f}",        # Current in Amperes
-            "VAL2": f"{voltage:.2f}",        # Voltage in Volts
-            "VAL3": f"{int(rpm)}",           # RPM
-            "VAL4": f"{temp_c:.1f}",         # Temperature Celsius
-            "VAL5": f"{humidity:.1f}",       # Humidity %
-            "VAL6": f"{temp_f:.1f}",         # Temperature Fahrenheit
-            "VAL7": f"{heat_index_c:.1f}",   # Heat Index Celsius
-            "VAL8": f"{heat_index_f:.1f}",   # Heat Index Fahrenheit
-            "VAL9": relay1,                  # Relay 1 Status
-            "VAL10": relay2,                 # Relay 2 Status
-            "VAL11": relay3,                 # Relay 3 Status
-            "VAL12": combined                # Combined Status
-        }
+        # Format data as expected by the system (Python scalars from here on)
+        packets = []
+        for row in zip(current.tolist(), voltage.tolist(), rpm.tolist(), temp_c.tolist(),
+                       humidity.tolist(), temp_f.tolist(), heat_index_c.tolist(),
+                       heat_index_f.tolist(), relay_mask.tolist()):
+            i, v, r, tc, h, tf, hic, hif, mask = row
+            # One format call renders all numeric fields (the ESP sends them as strings)
+            values = _VALUE_FORMAT(i, v, int(r), tc, h, tf, hic, hif).split("|")
+            packet = _PACKET_TEMPLATE.copy()
+            packet.update(zip(_FIELD_KEYS, (*values, *_RELAY_FIELDS[mask])))
+            packets.append(packet)
         
-        return data
+        return packets
     
     def send_data(self, data):
         """Send data to the monitoring system"""
+        return self._post(self.endpoint, data, [data])
+    
+    def send_batch(self, packets):
+        """Send several buffered packets in one request
+        
+        Contract: POST {server}/send-data/batch with {"packets": [...]}, where
+        each packet has the same VAL1-VAL12 format as /send-data. The server
+        processes the packets in list order.
+        """
+        return self._post(self.batch_endpoint, {'packets': packets}, packets)
+    
+    def _post(self, url, payload, packets):
         try:
-            response = requests.post(
-                self.endpoint,
-                json=data,
-                headers={'Content-Type': 'application/json'},
-                timeout=10
+            sent_at = time.perf_counter()
+            response = self.session.post(
+                url,
+                data=_encode(payload),
+                headers=self._headers,
+                timeout=_REQUEST_TIMEOUT
             )
             
             if response.status_code == 200:
-                print(f"✅ Data sent: V={data['VAL2']}V, I={data['VAL1']}A, RPM={data['VAL3']}, T={data['VAL4']}°C")
+                self._record_sent(packets, time.perf_counter() - sent_at)
                 return True
             else:
-                print(f"❌ Server error: {response.status_code} - {response.text}")
+                body = response.content[:_ERROR_BODY_LIMIT].decode(errors='replace')
+                print(f"❌ Server error: {response.status_code} - {body}")
                 return False
                 
         except requests.exceptions.ConnectionError:
@@ -110,6 +235,11 @@ class ESPSimulator:
             print(f"❌ Error: {e}")
             return False
     
+    def close(self):
+        """Close pooled HTTP connections"""
+        if self._owns_session:
+            self.session.close()
+    
     def test_single_send(self):
         """Test sending a single data packet"""
         print("🧪 Testing single data send...")
@@ -123,52 +253,237 @@ class ESPSimulator:
             print("❌ Single test failed!")
             return False
     
-    def run_simulation(self, interval=5, duration=300):
-        """Run continuous simulation"""
-        print(f"🚀 Starting ESP simulation")
-        print(f"⏱️  Interval: {interval}s, Duration: {duration}s")
-        print("Press Ctrl+C to stop early")
-        print("-" * 50)
+    def _record_sent(self, packets, latency):
+        self._latencies.append(latency)
+        if self.log_every == 1:
+            self._report_sent(packets)
+    
+    def _report_progress(self, stats):
+        elapsed = (time.monotonic_ns() - stats['start_ns']) / 1e9
+        line = f"📈 Packet {stats['count']} | Success: {stats['success']}/{stats['count']} | Elapsed: {elapsed:.1f}s"
+        if self._latencies:
+            latencies = np.array(self._latencies) * 1000
+            self._latencies.clear()
+            line += (f" | Latency avg={latencies.mean():.1f}ms"
+                     f" p99={np.quantile(latencies, 0.99):.1f}ms max={latencies.max():.1f}ms")
+        print(line)
+    
+    def _report_sent(self, packets):
+        data = packets[-1]
+        batch = f" (+{len(packets) - 1} buffered)" if len(packets) > 1 else ""
+        print(f"✅ Data sent: V={data['VAL2']}V, I={data['VAL1']}A, RPM={data['VAL3']}, T={data['VAL4']}°C{batch}")
+    
+    async def _send_async(self, session, packets):
+        """Send packets (batched if more than one) without blocking the event loop"""
+        if session is None:
+            # No aiohttp - run the blocking sender on a worker thread
+            if len(packets) == 1:
+                send, arg = self.send_data, packets[0]
+            else:
+                send, arg = self.send_batch, packets
+            return await asyncio.get_running_loop().run_in_executor(None, send, arg)
         
-        start_time = time.time()
-        count = 0
-        success_count = 0
+        if len(packets) == 1:
+            url, payload = self.endpoint, packets[0]
+        else:
+            url, payload = self.batch_endpoint, {'packets': packets}
         
-        try:
-            while True:
-                # Generate and send data
-                sensor_data = self.generate_sensor_data()
-                success = self.send_data(sensor_data)
+        for attempt in range(_RETRY_ATTEMPTS):
+            if attempt:
+                await asyncio.sleep(min(_RETRY_MAX_DELAY, _RETRY_BACKOFF * 2 ** attempt))
+            retry = attempt + 1 < _RETRY_ATTEMPTS
+            
+            try:
+                sent_at = time.perf_counter()
+                async with session.post(url, data=_encode(payload), headers=self._headers,
+                                        timeout=aiohttp.ClientTimeout(total=_REQUEST_TIMEOUT)) as response:
+                    if response.status == 200:
+                        self._record_sent(packets, time.perf_counter() - sent_at)
+                        return True
+                    if response.status in _RETRY_STATUSES and retry:
+                        continue
+                    
+                    body = (await response.content.read(_ERROR_BODY_LIMIT)).decode(errors='replace')
+                    print(f"❌ Server error: {response.status} - {body}")
+                    return False
+                    
+            except aiohttp.ClientConnectorError:
+                # The connection was never established, so nothing was sent
+                if retry:
+                    continue
+                print(f"❌ Connection error: Cannot reach {self.server_url}")
+                return False
+            except aiohttp.ClientConnectionError:
+                print(f"❌ Connection error: Lost connection to {self.server_url}")
+                return False
+            except asyncio.TimeoutError:
+                print(f"❌ Timeout: Server not responding")
+                return False
+            except Exception as e:
+                print(f"❌ Error: {e}")
+                return False
+    
+    async def run_async(self, interval=5, duration=300, burst=1, session=None):
+        """Run the simulation inside an already running event loop
+        
+        session is an optional externally owned aiohttp.ClientSession shared
+        with other simulators (see run_fleet). Returns the packet counters.
+        """
+        stats = {'start_ns': time.monotonic_ns(), 'count': 0, 'success': 0}
+        await self._run_async(interval, duration, burst, stats, session, handle_sigint=False)
+        return stats
+    
+    async def _run_async(self, interval, duration, burst, stats, session=None, handle_sigint=True):
+        """Send bursts of packets concurrently every interval"""
+        async with contextlib.AsyncExitStack() as stack:
+            if session is None and AIOHTTP_AVAILABLE:
+                session = await stack.enter_async_context(aiohttp.ClientSession(
+                    connector=aiohttp.TCPConnector(limit=_MAX_CONNECTIONS,
+                                                   keepalive_timeout=_KEEPALIVE_TIMEOUT)
+                ))
+            
+            loop = asyncio.get_running_loop()
+            self._loop = loop
+            self._stop = asyncio.Event()
+            stack.callback(self._clear_loop)
+            if handle_sigint:
+                _stop_on_sigint(loop, self.stop)
+            
+            start = loop.time()
+            slot = 0  # Index of the current tick; deadlines are start + slot * interval
+            ticks = 0
+            duration_ns = int(duration * 1_000_000_000)
+            
+            while not self._stop.is_set():
+                # Generate every packet of this tick at once, then send
+                packets = self.generate_sensor_data_batch(burst * self.batch_size)
+                results = await asyncio.gather(*(
+                    self._send_async(session, packets[offset:offset + self.batch_size])
+                    for offset in range(0, len(packets), self.batch_size)
+                ))
                 
-                count += 1
-                if success:
-                    success_count += 1
+                stats['count'] += len(results) * self.batch_size
+                stats['success'] += sum(results) * self.batch_size
+                ticks += 1
                 
-                elapsed = time.time() - start_time
-                print(f"📈 Packet {count} | Success: {success_count}/{count} | Elapsed: {elapsed:.1f}s")
+                if ticks % self.log_every == 0:
+                    self._report_progress(stats)
+                elapsed_ns = time.monotonic_ns() - stats['start_ns']
                 
                 # Check if duration exceeded
-                if duration > 0 and elapsed >= duration:
+                if duration_ns > 0 and elapsed_ns >= duration_ns:
                     print(f"⏰ Simulation completed ({duration}s)")
                     break
                 
-                # Wait for next interval
-                time.sleep(interval)
+                # Ticks stay aligned to the start time regardless of send latency
+                slot += 1
+                next_tick = start + slot * interval
+                now = loop.time()
+                if now > next_tick and interval > 0:
+                    print(f"⚠️  Send overran the interval by {now - next_tick:.2f}s - skipping ahead")
+                    slot = math.ceil((now - start) / interval)
+                    next_tick = start + slot * interval
                 
+                # Wait for next interval, or return at once when stopped
+                try:
+                    await asyncio.wait_for(self._stop.wait(), timeout=max(0, next_tick - now))
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                print("\n🛑 Simulation stopped")
+    
+    def stop(self):
+        """Stop a running simulation (safe to call from any thread)"""
+        if self._loop is not None and self._stop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+    
+    def _clear_loop(self):
+        self._loop = self._stop = None
+    
+    def run_simulation(self, interval=5, duration=300, burst=1):
+        """Run continuous simulation"""
+        print(f"🚀 Starting ESP simulation")
+        print(f"⏱️  Interval: {interval}s, Duration: {duration}s, Burst: {burst} packet(s)")
+        if not AIOHTTP_AVAILABLE:
+            print("⚠️  aiohttp not available - sending with requests on worker threads")
+        print("Press Ctrl+C to stop early")
+        print("-" * 50)
+        
+        stats = {'start_ns': time.monotonic_ns(), 'count': 0, 'success': 0}
+        
+        try:
+            asyncio.run(self._run_async(interval, duration, burst, stats))
         except KeyboardInterrupt:
             print("\n🛑 Simulation stopped by user")
         except Exception as e:
             print(f"💥 Simulation error: {e}")
+        finally:
+            self.close()
+        
+        _print_summary(stats['count'], stats['success'], (time.monotonic_ns() - stats['start_ns']) / 1e9)
+
+def _stop_on_sigint(loop, stop):
+    """Call stop() on Ctrl+C where the loop can install a signal handler"""
+    try:
+        loop.add_signal_handler(signal.SIGINT, stop)
+    except (NotImplementedError, RuntimeError, ValueError):
+        pass  # Windows or not the main thread - Ctrl+C unwinds the loop instead
+
+def _print_summary(count, success_count, elapsed):
+    success_rate = (success_count / count) * 100 if count > 0 else 0
+    
+    print("-" * 50)
+    print(f"📊 Summary:")
+    print(f"   Total packets: {count}")
+    print(f"   Successful: {success_count}")
+    print(f"   Success rate: {success_rate:.1f}%")
+    print(f"   Duration: {elapsed:.1f}s")
+
+async def run_fleet(simulators, interval=5, duration=300, burst=1):
+    """Run several simulated ESP devices concurrently on one event loop
+    
+    All devices share a single aiohttp connection pool. Ctrl+C stops every
+    device. Returns the packet counters of each simulator.
+    """
+    async with contextlib.AsyncExitStack() as stack:
+        session = None
+        if AIOHTTP_AVAILABLE:
+            session = await stack.enter_async_context(aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=max(_MAX_CONNECTIONS, len(simulators)),
+                                               keepalive_timeout=_KEEPALIVE_TIMEOUT)
+            ))
         
-        elapsed = time.time() - start_time
-        success_rate = (success_count / count) * 100 if count > 0 else 0
+        _stop_on_sigint(asyncio.get_running_loop(),
+                        lambda: [simulator.stop() for simulator in simulators])
         
-        print("-" * 50)
-        print(f"📊 Summary:")
-        print(f"   Total packets: {count}")
-        print(f"   Successful: {success_count}")
-        print(f"   Success rate: {success_rate:.1f}%")
-        print(f"   Duration: {elapsed:.1f}s")
+        return await asyncio.gather(*(
+            simulator.run_async(interval, duration, burst, session=session)
+            for simulator in simulators
+        ))
+
+def run_fleet_simulation(server_url, devices, interval=5, duration=300, burst=1, batch_size=1, log_every=1):
+    """Simulate several ESP devices from one process"""
+    # Without aiohttp the devices send through requests - give them one shared pool
+    http_session = create_http_session(pool_maxsize=max(_MAX_CONNECTIONS, devices))
+    simulators = [ESPSimulator(server_url, batch_size, log_every, http_session)
+                  for _ in range(devices)]
+    print(f"🚀 Starting fleet of {devices} ESP devices")
+    print("-" * 50)
+    
+    start_ns = time.monotonic_ns()
+    results = []
+    try:
+        results = asyncio.run(run_fleet(simulators, interval, duration, burst))
+    except KeyboardInterrupt:
+        print("\n🛑 Simulation stopped by user")
+    except Exception as e:
+        print(f"💥 Simulation error: {e}")
+    finally:
+        http_session.close()
+    
+    _print_summary(sum(stats['count'] for stats in results),
+                   sum(stats['success'] for stats in results),
+                   (time.monotonic_ns() - start_ns) / 1e9)
 
 def main():
     import sys
@@ -177,7 +492,12 @@ def main():
     server_url = "http://localhost:5000"
     interval = 5
     duration = 300
+    burst = 1
+    batch_size = 1
+    devices = 1
+    log_every = 1
     test_only = False
+    seed = None
     
     # Simple argument parsing
     for i, arg in enumerate(sys.argv):
@@ -187,6 +507,16 @@ def main():
             interval = int(sys.argv[i + 1])
         elif arg == "--duration" and i + 1 < len(sys.argv):
             duration = int(sys.argv[i + 1])
+        elif arg == "--burst" and i + 1 < len(sys.argv):
+            burst = int(sys.argv[i + 1])
+        elif arg == "--batch-size" and i + 1 < len(sys.argv):
+            batch_size = int(sys.argv[i + 1])
+        elif arg == "--devices" and i + 1 < len(sys.argv):
+            devices = int(sys.argv[i + 1])
+        elif arg == "--log-every" and i + 1 < len(sys.argv):
+            log_every = int(sys.argv[i + 1])
+        elif arg == "--seed" and i + 1 < len(sys.argv):
+            seed = int(sys.argv[i + 1])
         elif arg == "--test-only":
             test_only = True
         elif arg == "--help":
@@ -196,6 +526,11 @@ def main():
             print("  --server URL       Server URL (default: http://localhost:5000)")
             print("  --interval SEC     Send interval in seconds (default: 5)")
             print("  --duration SEC     Duration in seconds (default: 300)")
+            print("  --burst N          Requests sent concurrently per interval (default: 1)")
+            print("  --batch-size N     Packets per request via /send-data/batch (default: 1)")
+            print("  --devices N        Simulated ESP devices sharing one connection pool (default: 1)")
+            print("  --log-every N      Report progress and latency every N intervals (default: 1)")
+            print("  --seed N           Seed the random generator for a reproducible run")
             print("  --test-only        Send only one test packet")
             print("  --help             Show this help")
             return
@@ -204,12 +539,18 @@ def main():
     print("🔌 ESP/ARDUINO DATA SIMULATOR")
     print("=" * 60)
     
-    simulator = ESPSimulator(server_url)
+    if seed is not None:
+        seed_rng(seed)
     
     if test_only:
+        simulator = ESPSimulator(server_url, batch_size, log_every)
         simulator.test_single_send()
+        simulator.close()
+    elif devices > 1:
+        run_fleet_simulation(server_url, devices, interval, duration, burst, batch_size, log_every)
     else:
-        simulator.run_simulation(interval, duration)
+        simulator = ESPSimulator(server_url, batch_size, log_every)
+        simulator.run_simulation(interval, duration, burst)
 
 if __name__ == "__main__":
     main()
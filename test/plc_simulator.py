@@ -2,11 +2,20 @@
 """
 FX5U PLC Data Simulator - Standalone Version
 Writes realistic fake data to PLC registers for testing
+
+With numba installed the raw conversion kernels are compiled for their
+declared signatures when this module is first imported (and cached on
+disk), so the first simulation cycle does not wait for the JIT.
 """
 
+import math
 import time
-import random
+import signal
+import socket
+import asyncio
 import logging
+import threading
+import numpy as np
 from datetime import datetime
 
 # Setup logging
@@ -16,17 +25,75 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# numba is optional - without it the conversion kernels run as plain Python/numpy
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    
+    def njit(*args, **kwargs):
+        return lambda func: func
+
+# Reciprocal gains so the conversion multiplies instead of divides
+#
+# The conversions are linear, so they stay a single multiply instead of a
+# lookup table - a table read is no faster than that and can miss the cache.
+# If a non-linear calibration table is ever needed (e.g. a thermistor curve),
+# touch one entry per 64-byte cache line in connect() so the first cycles do
+# not pay for the misses.
+_INV_TEMP_SCALE = 1.0 / 0.05175
+_VOLT_GAIN_PER_V = 4095.0 / 30.0
+_TEMP_RAW_MAX = 65535.0  # D102 holds a 16-bit value
+_VOLT_RAW_MAX = 4095.0   # D100 holds a 12-bit ADC value
+
+# Upper bound on readings pre-generated at once by run_simulation()
+_MAX_BATCH = 256
+
+@njit('int32[:](float64[:], float64, float64)', cache=True, fastmath=True)
+def _to_raw(values, gain, limit):
+    """Raw register values: values x gain, truncated and limited to [0, limit]"""
+    return np.minimum(np.maximum(values * gain, 0.0), limit).astype(np.int32)
+
+# Single-value twins of _to_raw with the gain and limit folded in as constants,
+# so one reading is not wrapped in an array
+@njit('int32(float64)', cache=True, fastmath=True)
+def _temp_to_raw(temp_celsius):
+    """D102 raw value for one temperature (see _to_raw)"""
+    return int(min(max(temp_celsius * _INV_TEMP_SCALE, 0.0), _TEMP_RAW_MAX))
+
+@njit('int32(float64)', cache=True, fastmath=True)
+def _volt_to_raw(voltage):
+    """D100 raw value for one voltage (see _to_raw)"""
+    return int(min(max(voltage * _VOLT_GAIN_PER_V, 0.0), _VOLT_RAW_MAX))
+
 class PLCSimulator:
     def __init__(self, plc_ip="192.168.3.39", plc_port=5007):
         self.plc_ip = plc_ip
         self.plc_port = plc_port
         self.connected = False
         self.mc = None
+        # Set when the PLC could not be reached - writes are then only logged
+        self._simulated = False
+        
+        # The MC protocol client is shared by the writer and verifier worker threads
+        self._mc_lock = threading.Lock()
+        # D101 sits between the two written registers - it is read once per
+        # connection and written back unchanged
+        self._d101 = None
+        
+        # Set while run_simulation() is active
+        self._loop = None
+        self._stop = None
+        self._verify_due = None
         
         # Target values for simulation
         self.base_motor_temp = 28.0     # 28°C base temperature
         self.base_motor_voltage = 24.0  # 24V base voltage
         
+        # Random source for both single readings and batches
+        self._rng = np.random.default_rng()
+        
         print(f"🏭 PLC Simulator initialized")
         print(f"🌐 Target PLC: {plc_ip}:{plc_port}")
         print(f"📊 Base values: 24V motor voltage, 28°C motor temperature")
@@ -48,8 +115,15 @@ class PLCSimulator:
             self.connected = True
             return True
         
+        # Close the socket of a previous connection so reconnecting does not leak it
+        self._close_socket()
+        self._d101 = None
+        
         try:
-            if self.mc.connect(self.plc_ip, self.plc_port):
+            result = self.mc.connect(self.plc_ip, self.plc_port)
+            if result:
+                self._tune_socket()
+                self._simulated = False
                 self.connected = True
                 print(f"✅ Connected to FX5U PLC: {self.plc_ip}:{self.plc_port}")
                 return True
@@ -59,14 +133,35 @@ class PLCSimulator:
         except Exception as e:
             print(f"❌ PLC connection error: {e}")
             print("⚠️  Running in simulation mode")
+            self._simulated = True
             self.connected = True  # Simulate connection for testing
             return True
     
+    def _close_socket(self):
+        with self._mc_lock:
+            try:
+                self.mc.close()
+            except Exception:
+                pass  # Never connected - there is no socket to close
+    
+    def _tune_socket(self):
+        """Send each small MC frame immediately (no Nagle delay) and keep the link alive"""
+        # The socket attribute name differs between pymcprotocol versions
+        sock = getattr(self.mc, '_sock', None) or getattr(self.mc, 'sock', None)
+        if sock is None:
+            return
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        except OSError as e:
+            logger.debug("Could not set PLC socket options: %s", e)
+    
     def disconnect(self):
         """Disconnect from PLC"""
         try:
             if self.connected and self.pymcprotocol_available and self.mc:
-                self.mc.close()
+                with self._mc_lock:  # Let an in-flight read/write finish first
+                    self.mc.close()
                 self.connected = False
                 print("🔌 PLC disconnected")
         except Exception as e:
@@ -76,35 +171,43 @@ class PLCSimulator:
         """Convert temperature to raw value for D102
         Using reverse formula: Raw = Temperature / 0.05175
         """
-        if temp_celsius <= 0:
-            return 0
-        raw_value = int(temp_celsius / 0.05175)
-        return min(max(raw_value, 0), 65535)  # Limit to 16-bit range
+        return _temp_to_raw(temp_celsius)
     
     def voltage_to_raw(self, voltage):
         """Convert voltage to raw value for D100
         Assuming 4095 represents ~30V full scale for 24V system
         """
-        if voltage <= 0:
-            return 0
-        raw_value = int((voltage / 30.0) * 4095)
-        return min(max(raw_value, 0), 4095)  # Limit to 12-bit range
+        return _volt_to_raw(voltage)
     
     def generate_plc_data(self):
         """Generate realistic PLC register values"""
         # Generate motor temperature (D102) with realistic variation
-        motor_temp = self.base_motor_temp + random.uniform(-5.0, 15.0)  # 23°C to 43°C
+        motor_temp = self.base_motor_temp - 5.0 + 20.0 * self._rng.random()  # 23°C to 43°C
         motor_temp = max(20.0, min(60.0, motor_temp))  # Reasonable limits
         
-        # Generate motor voltage (D100) with small variation  
-        motor_voltage = self.base_motor_voltage + random.uniform(-1.0, 1.0)  # 23V to 25V
+        # Generate motor voltage (D100) with small variation
+        motor_voltage = self.base_motor_voltage - 1.0 + 2.0 * self._rng.random()  # 23V to 25V
         motor_voltage = max(20.0, min(28.0, motor_voltage))  # Safe limits
         
         # Convert to raw register values
         raw_d102 = self.temperature_to_raw(motor_temp)  # Temperature
         raw_d100 = self.voltage_to_raw(motor_voltage)   # Voltage
         
-        print(f"📊 Generated: Temp={motor_temp:.1f}°C->D102({raw_d102}), Voltage={motor_voltage:.1f}V->D100({raw_d100})")
+        logger.debug("Generated: Temp=%.1f°C->D102(%d), Voltage=%.1fV->D100(%d)",
+                     motor_temp, raw_d102, motor_voltage, raw_d100)
+        
+        return raw_d100, raw_d102, motor_voltage, motor_temp
+    
+    def generate_plc_data_batch(self, n):
+        """Generate n realistic register value sets at once"""
+        # Motor temperature (D102): 23°C to 43°C, within reasonable limits
+        motor_temp = np.clip(self.base_motor_temp + self._rng.uniform(-5.0, 15.0, n), 20.0, 60.0)
+        # Motor voltage (D100): 23V to 25V, within safe limits
+        motor_voltage = np.clip(self.base_motor_voltage + self._rng.uniform(-1.0, 1.0, n), 20.0, 28.0)
+        
+        # Convert to raw register values
+        raw_d102 = _to_raw(motor_temp, _INV_TEMP_SCALE, _TEMP_RAW_MAX)
+        raw_d100 = _to_raw(motor_voltage, _VOLT_GAIN_PER_V, _VOLT_RAW_MAX)
         
         return raw_d100, raw_d102, motor_voltage, motor_temp
     
@@ -114,46 +217,64 @@ class PLCSimulator:
             if not self.connect():
                 return False
         
-        if not self.pymcprotocol_available:
-            print(f"🔧 [SIMULATED] Writing: D100={d100_value}, D102={d102_value}")
+        if not self.pymcprotocol_available or self._simulated:
+            logger.debug("[SIMULATED] Writing: D100=%d, D102=%d", d100_value, d102_value)
             return True
         
         try:
-            # Write to D100 (Voltage)
-            self.mc.batchwrite_wordunits(headdevice="D100", values=[d100_value])
+            # Write D100 (Voltage) and D102 (Temperature) in one MC frame,
+            # keeping the current value of D101
+            with self._mc_lock:
+                if self._d101 is None:
+                    self._d101 = self.mc.batchread_wordunits(headdevice="D101", readsize=1)[0]
+                self.mc.batchwrite_wordunits(
+                    headdevice="D100", values=[d100_value, self._d101, d102_value]
+                )
             
-            # Write to D102 (Temperature) 
-            self.mc.batchwrite_wordunits(headdevice="D102", values=[d102_value])
-            
-            print(f"✅ Written to PLC: D100={d100_value}, D102={d102_value}")
+            logger.debug("Written to PLC: D100=%d, D102=%d", d100_value, d102_value)
             return True
             
         except Exception as e:
             print(f"❌ Error writing PLC data: {e}")
+            self.connected = False  # Reconnect on the next write
             return False
     
     def verify_data(self):
         """Read back and verify written data"""
-        if not self.connected or not self.pymcprotocol_available:
-            print("🔧 [SIMULATED] Data verification - OK")
+        if not self.connected or not self.pymcprotocol_available or self._simulated:
+            logger.debug("[SIMULATED] Data verification - OK")
             return True
         
         try:
-            # Read back the written values
-            d100_readback = self.mc.batchread_wordunits(headdevice="D100", readsize=1)
-            d102_readback = self.mc.batchread_wordunits(headdevice="D102", readsize=1)
+            # Read back D100-D102 in a single MC frame
+            with self._mc_lock:
+                readback = self.mc.batchread_wordunits(headdevice="D100", readsize=3)
+            d100_readback = readback[0]
+            d102_readback = readback[2]
             
             # Convert back to engineering units for verification
             voltage = (d100_readback / 4095.0) * 30.0
             temperature = d102_readback * 0.05175
             
-            print(f"✅ Verified: D100({d100_readback})={voltage:.1f}V, D102({d102_readback})={temperature:.1f}°C")
+            logger.debug("Verified: D100(%d)=%.1fV, D102(%d)=%.1f°C",
+                         d100_readback, voltage, d102_readback, temperature)
             return True
             
         except Exception as e:
             print(f"❌ Error verifying PLC data: {e}")
             return False
     
+    async def _verify_worker(self):
+        """Verify the registers whenever the writer requests it
+        
+        Requests made while a verification is running collapse into one.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._verify_due.wait()
+            self._verify_due.clear()
+            await loop.run_in_executor(None, self.verify_data)
+    
     def test_single_write(self):
         """Test writing a single data set"""
         print("🧪 Testing single PLC write...")
@@ -173,55 +294,110 @@ class PLCSimulator:
             print("❌ Single PLC test failed!")
             return False
     
-    def run_simulation(self, interval=10, duration=600):
-        """Run continuous PLC data simulation"""
+    async def write_data_async(self, d100_value, d102_value):
+        """write_data() on a worker thread so the event loop keeps running"""
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self.write_data, d100_value, d102_value
+        )
+    
+    def stop(self):
+        """Stop a running simulation (safe to call from any thread)"""
+        if self._loop is not None and self._stop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+    
+    async def run_simulation(self, interval=10, duration=600):
+        """Run continuous PLC data simulation - start with asyncio.run()"""
         print(f"🚀 Starting PLC simulation")
         print(f"⏱️  Interval: {interval}s, Duration: {duration}s")
         print("Press Ctrl+C to stop early")
         print("-" * 50)
         
-        if not self.connect():
+        loop = asyncio.get_running_loop()
+        if not await loop.run_in_executor(None, self.connect):
             print("❌ Cannot start simulation - PLC connection failed")
             return
         
-        start_time = time.time()
+        self._loop = loop
+        self._stop = asyncio.Event()
+        self._verify_due = asyncio.Event()
+        verifier = asyncio.create_task(self._verify_worker())
+        try:
+            loop.add_signal_handler(signal.SIGINT, self._stop.set)
+        except (NotImplementedError, RuntimeError, ValueError):
+            pass  # Windows or not the main thread - Ctrl+C unwinds the loop instead
+        
+        start_ns = time.monotonic_ns()
+        duration_ns = int(duration * 1_000_000_000)
         count = 0
         success_count = 0
+        start = loop.time()
+        slot = 0  # Index of the current tick; deadlines are start + slot * interval
+        
+        # Readings are pre-generated in batches covering the run (refilled when used up)
+        if duration > 0 and interval > 0:
+            batch_size = min(int(duration // interval) + 1, _MAX_BATCH)
+        else:
+            batch_size = _MAX_BATCH
+        pending = iter(())
         
         try:
-            while True:
+            while not self._stop.is_set():
                 # Generate and write data
-                d100_val, d102_val, voltage, temp = self.generate_plc_data()
-                success = self.write_data(d100_val, d102_val)
+                reading = next(pending, None)
+                if reading is None:
+                    pending = zip(*(column.tolist() for column in self.generate_plc_data_batch(batch_size)))
+                    reading = next(pending)
+                d100_val, d102_val, voltage, temp = reading
+                logger.debug("Cycle %d: Temp=%.1f°C->D102(%d), Voltage=%.1fV->D100(%d)",
+                             count + 1, temp, d102_val, voltage, d100_val)
+                success = await self.write_data_async(d100_val, d102_val)
                 
                 count += 1
                 if success:
                     success_count += 1
                     
-                    # Verify data occasionally
+                    # Verify data occasionally - the worker task runs it, never the writer
                     if count % 5 == 0:  # Every 5 cycles
-                        self.verify_data()
+                        self._verify_due.set()
                 
-                elapsed = time.time() - start_time
+                elapsed_ns = time.monotonic_ns() - start_ns
+                elapsed = elapsed_ns / 1e9
                 success_rate = (success_count / count) * 100 if count > 0 else 0
-                print(f"📈 Cycle {count} | Success: {success_count}/{count} ({success_rate:.1f}%) | Elapsed: {elapsed:.1f}s")
+                logger.info("Cycle %d | Success: %d/%d (%.1f%%) | Elapsed: %.1fs",
+                            count, success_count, count, success_rate, elapsed)
                 
                 # Check if duration exceeded
-                if duration > 0 and elapsed >= duration:
+                if duration_ns > 0 and elapsed_ns >= duration_ns:
                     print(f"⏰ Simulation completed ({duration}s)")
                     break
                 
-                # Wait for next interval
-                time.sleep(interval)
+                # Ticks stay aligned to the start time regardless of write latency
+                slot += 1
+                next_tick = start + slot * interval
+                now = loop.time()
+                if now > next_tick and interval > 0:
+                    logger.warning("Write overran the interval by %.2fs - skipping ahead", now - next_tick)
+                    slot = math.ceil((now - start) / interval)
+                    next_tick = start + slot * interval
+                
+                # Wait for next interval, or return at once when stopped
+                try:
+                    await asyncio.wait_for(self._stop.wait(), timeout=max(0, next_tick - now))
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                print("\n🛑 Simulation stopped")
                 
-        except KeyboardInterrupt:
+        except (KeyboardInterrupt, asyncio.CancelledError):
             print("\n🛑 Simulation stopped by user")
         except Exception as e:
             print(f"💥 Simulation error: {e}")
         finally:
+            verifier.cancel()
+            self._loop = self._stop = self._verify_due = None
             self.disconnect()
         
-        elapsed = time.time() - start_time
+        elapsed = (time.monotonic_ns() - start_ns) / 1e9
         success_rate = (success_count / count) * 100 if count > 0 else 0
         
         print("-" * 50)
@@ -234,36 +410,35 @@ class PLCSimulator:
 def main():
     import sys
     
-    # Parse command line arguments manually
-    plc_ip = "192.168.3.39"
-    plc_port = 5007
-    interval = 10
-    duration = 600
-    test_only = False
+    # Boolean flags are taken out first so the remaining arguments pair up as
+    # "--option value"
+    args = sys.argv[1:]
     
-    # Simple argument parsing
-    for i, arg in enumerate(sys.argv):
-        if arg == "--ip" and i + 1 < len(sys.argv):
-            plc_ip = sys.argv[i + 1]
-        elif arg == "--port" and i + 1 < len(sys.argv):
-            plc_port = int(sys.argv[i + 1])
-        elif arg == "--interval" and i + 1 < len(sys.argv):
-            interval = int(sys.argv[i + 1])
-        elif arg == "--duration" and i + 1 < len(sys.argv):
-            duration = int(sys.argv[i + 1])
-        elif arg == "--test-only":
-            test_only = True
-        elif arg == "--help":
-            print("PLC Simulator - Usage:")
-            print("  python plc_simulator.py [options]")
-            print("Options:")
-            print("  --ip IP            PLC IP address (default: 192.168.3.39)")
-            print("  --port PORT        PLC port (default: 5007)")
-            print("  --interval SEC     Write interval in seconds (default: 10)")
-            print("  --duration SEC     Duration in seconds (default: 600)")
-            print("  --test-only        Write only one test data set")
-            print("  --help             Show this help")
-            return
+    if "--help" in args:
+        print("PLC Simulator - Usage:")
+        print("  python plc_simulator.py [options]")
+        print("Options:")
+        print("  --ip IP            PLC IP address (default: 192.168.3.39)")
+        print("  --port PORT        PLC port (default: 5007)")
+        print("  --interval SEC     Write interval in seconds (default: 10)")
+        print("  --duration SEC     Duration in seconds (default: 600)")
+        print("  --test-only        Write only one test data set")
+        print("  --verbose          Log every generated, written and verified value")
+        print("  --help             Show this help")
+        return
+    
+    test_only = "--test-only" in args
+    verbose = "--verbose" in args
+    options = [arg for arg in args if arg not in ("--test-only", "--verbose")]
+    values = dict(zip(options[::2], options[1::2]))
+    
+    plc_ip = values.get("--ip", "192.168.3.39")
+    plc_port = int(values.get("--port", 5007))
+    interval = int(values.get("--interval", 10))
+    duration = int(values.get("--duration", 600))
+    
+    if verbose:
+        logger.setLevel(logging.DEBUG)
     
     print("=" * 60)
     print("🏭 FX5U PLC DATA SIMULATOR")
@@ -274,7 +449,7 @@ def main():
     if test_only:
         simulator.test_single_write()
     else:
-        simulator.run_simulation(interval, duration)
+        asyncio.run(simulator.run_simulation(interval, duration))
 
 if __name__ == "__main__":
     main()
@@ -5,10 +5,20 @@ Runs ESP and PLC tests in separate threads
 """
 
 import time
+import asyncio
+import logging
 import threading
 import sys
 import os
 
+# Import the simulators once on the main thread so the test threads start straight away
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from esp_simulator import ESPSimulator
+from plc_simulator import PLCSimulator
+
+# Simulators started by the test threads, so main() can stop them cleanly
+_simulators = []
+
 print("=" * 60)
 print("🧪 SIMPLE AI MOTOR MONITORING TEST SUITE")
 print("=" * 60)
@@ -17,11 +27,8 @@ def run_esp_test():
     """Run ESP test in thread"""
     print("🔌 Starting ESP test thread...")
     try:
-        # Import and run ESP simulator
-        sys.path.append(os.path.dirname(__file__))
-        from esp_simulator import ESPSimulator
-        
         simulator = ESPSimulator("http://10.133.143.247:5000")
+        _simulators.append(simulator)
         
         # Test single send first
         if simulator.test_single_send():
@@ -30,8 +37,6 @@ def run_esp_test():
         else:
             print("🔌 ESP single test failed - check if main app is running")
             
-    except ImportError as e:
-        print(f"🔌 ESP test import error: {e}")
     except Exception as e:
         print(f"🔌 ESP test error: {e}")
 
@@ -39,25 +44,23 @@ def run_plc_test():
     """Run PLC test in thread"""
     print("🏭 Starting PLC test thread...")
     try:
-        # Import and run PLC simulator
-        sys.path.append(os.path.dirname(__file__))
-        from plc_simulator import PLCSimulator
-        
         simulator = PLCSimulator("192.168.3.39", 5007)
+        _simulators.append(simulator)
         
         # Test single write first
         if simulator.test_single_write():
             print("🏭 PLC single test passed - starting continuous...")
-            simulator.run_simulation(interval=10, duration=60)  # 1 minute
+            asyncio.run(simulator.run_simulation(interval=10, duration=60))  # 1 minute
         else:
             print("🏭 PLC single test completed (may be simulated)")
             
-    except ImportError as e:
-        print(f"🏭 PLC test import error: {e}")
     except Exception as e:
         print(f"🏭 PLC test error: {e}")
 
 def main():
+    # Per-cycle simulator detail is logged at DEBUG and skipped at this level
+    logging.getLogger().setLevel(logging.INFO)
+    
     print("🚀 Starting both tests...")
     print("⏱️  Each test will run for 60 seconds")
     print("Press Ctrl+C to stop")
@@ -80,6 +83,11 @@ def main():
         
     except KeyboardInterrupt:
         print("\n🛑 Tests interrupted by user")
+        # Let the simulators finish their current cycle and print their summaries
+        for simulator in _simulators:
+            simulator.stop()
+        esp_thread.join(timeout=5)
+        plc_thread.join(timeout=5)
 
 if __name__ == "__main__":
     main()
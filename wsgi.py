@@ -0,0 +1,10 @@
+"""
+WSGI Entry Point
+Production server entry: gunicorn -c gunicorn_conf.py wsgi:app
+"""
+
+from main import create_app
+
+app = create_app()
+# Shut down by the gunicorn worker_exit hook (see gunicorn_conf.py)
+system = app.extensions['motor_monitoring']